@@ -0,0 +1,155 @@
+import asyncio
+import multiprocessing
+import concurrent.futures
+import SudokuBoard
+import BTSolver
+import Trail
+import SearchMonitor
+
+"""
+    asyncio front end for BTSolver.
+
+        solver = AsyncSolver( processes = 4, maxPending = 64 )
+        solution = await solver.solve( board, { "var" : "MinimumRemainingValue",
+                                                "cc"  : "forwardChecking" } )
+
+    Solves run on a fixed pool of worker processes. At most maxPending
+    solves are admitted at once; further calls wait for a free slot, which
+    pushes back on producers instead of growing an unbounded queue.
+
+    Every admitted solve owns a slot in a shared flag array. Cancelling the
+    awaiting task raises the slot's flag, and the worker polls it between
+    node expansions through a SearchMonitor, so a runaway search stops
+    within pollInterval nodes and its worker is free for the next request.
+"""
+
+# Cancellation flags shared with the worker processes, one per slot
+FLAGS = None
+
+def initWorker ( flags ):
+    global FLAGS
+    FLAGS = flags
+
+class CancelMonitor ( SearchMonitor.SearchMonitor ):
+
+    def __init__ ( self, slot, pollInterval ):
+        self.slot = slot
+        self.pollInterval = pollInterval
+        self.nodes = 0
+
+    def onNode ( self, solver, v ):
+        self.nodes += 1
+        if self.nodes % self.pollInterval == 0 and FLAGS[self.slot]:
+            raise SearchMonitor.SearchAborted( "cancelled" )
+
+# The board travels in the input file format so its variant constraints come along
+def runSolve ( slot, text, config, pollInterval ):
+    if FLAGS[slot]:
+        return "cancelled", None
+
+    board = SudokuBoard.SudokuBoard( text = text )
+    solver = BTSolver.BTSolver( board, Trail.Trail( config.get( "maxBytes" ) ), config.get( "val", "" ),
+                                config.get( "var", "" ), config.get( "cc", "" ) )
+    solver.addMonitor( CancelMonitor( slot, pollInterval ) )
+    try:
+        solver.solve()
+    except SearchMonitor.SearchAborted as e:
+        return e.status, None
+
+    if solver.hassolution:
+        return "solved", solver.getSolution().board
+    return "unsolvable", None
+
+class AsyncSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, processes = None, maxPending = 64, pollInterval = 32 ):
+        self.processes = processes
+        self.maxPending = maxPending
+        self.pollInterval = pollInterval
+
+        self.flags = multiprocessing.Array( "b", maxPending, lock = False )
+        self.executor = None
+        self.slots = None
+
+    # ==================================================================
+    # Lifecycle
+    # ==================================================================
+
+    def start ( self ):
+        if self.executor != None:
+            return
+        self.executor = concurrent.futures.ProcessPoolExecutor( self.processes, initializer = initWorker,
+                                                                initargs = (self.flags,) )
+        self.slots = asyncio.Queue()
+        for slot in range( self.maxPending ):
+            self.slots.put_nowait( slot )
+
+    async def close ( self ):
+        if self.executor == None:
+            return
+        executor = self.executor
+        self.executor = None
+        await asyncio.get_running_loop().run_in_executor( None, executor.shutdown )
+
+    async def __aenter__ ( self ):
+        self.start()
+        return self
+
+    async def __aexit__ ( self, *exc ):
+        await self.close()
+
+    # ==================================================================
+    # Solving
+    # ==================================================================
+
+    """
+        Solves board with the BTSolver heuristic names in config ("var",
+        "val" and "cc") and the trail memory cap in config["maxBytes"], if
+        any. Returns the solution as a SudokuBoard, or None if the board
+        has no solution or the cap was reached. Raises asyncio.CancelledError when
+        cancelled, after the worker has stopped.
+    """
+    async def solve ( self, board, config = None ):
+        self.start()
+        config = config if config != None else {}
+        loop = asyncio.get_running_loop()
+
+        slot = await self.slots.get()
+        self.flags[slot] = 0
+        try:
+            future = loop.run_in_executor( self.executor, runSolve, slot, board.toFileString(),
+                                           config, self.pollInterval )
+            try:
+                status, grid = await asyncio.shield( future )
+            except asyncio.CancelledError:
+                self.flags[slot] = 1
+                try:
+                    await future
+                except Exception:
+                    pass
+                raise
+        finally:
+            self.slots.put_nowait( slot )
+
+        if status == "solved":
+            return SudokuBoard.SudokuBoard( board.p, board.q, board = grid )
+        if status == "cancelled":
+            raise asyncio.CancelledError()
+        return None
+
+    # Number of solves waiting for or holding a slot
+    def pending ( self ):
+        return self.maxPending - self.slots.qsize() if self.slots != None else 0
+
+# Solver shared by solveAsync, created on first use
+DEFAULT_SOLVER = None
+
+async def solveAsync ( board, config = None ):
+    global DEFAULT_SOLVER
+    if DEFAULT_SOLVER == None:
+        DEFAULT_SOLVER = AsyncSolver()
+    return await DEFAULT_SOLVER.solve( board, config )
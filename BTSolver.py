@@ -1,10 +1,5 @@
-import SudokuBoard
-import Variable
-import Domain
-import Trail
-import Constraint
 import ConstraintNetwork
-import time
+from time import perf_counter
 
 class BTSolver:
 
@@ -12,7 +7,7 @@ class BTSolver:
     # Constructors
     # ==================================================================
 
-    def __init__ ( self, gb, trail, val_sh, var_sh, cc ):
+    def __init__ ( self, gb, trail, val_sh, var_sh, cc, nogoods = None ):
         self.network = ConstraintNetwork.ConstraintNetwork(gb)
         self.hassolution = False
         self.gameboard = gb
@@ -21,6 +16,41 @@ class BTSolver:
         self.varHeuristics = var_sh
         self.valHeuristics = val_sh
         self.cChecks = cc
+        self.resolveHeuristics()
+
+        # Optional nogood learning, enabled by passing a NogoodStore
+        self.nogoods = nogoods
+        self.decisions = dict()
+        self.path = set()
+        self.reasons = dict()
+        self.reasonJournal = []
+        self.reasonMarkers = []
+        self.conflict = None
+
+        # Attached SearchMonitors and the engine functions they wrap, see addMonitor
+        self.monitors = []
+        self.engine = None
+
+    """
+        Prepares the solver for another board of the same p x q shape,
+        reusing its network, trail and resolved heuristics instead of
+        building new ones. Constraint weights and learned nogoods are
+        dropped since they describe the previous board.
+    """
+    def reset ( self, gb ):
+        self.network.reset( gb )
+        self.gameboard = gb
+        self.hassolution = False
+        self.trail.clear()
+
+        if self.nogoods != None:
+            self.nogoods.clear()
+        self.decisions = dict()
+        self.path = set()
+        self.reasons = dict()
+        self.reasonJournal = []
+        self.reasonMarkers = []
+        self.conflict = None
 
     # ==================================================================
     # Consistency Checks
@@ -46,22 +76,39 @@ class BTSolver:
         Return: true is assignment is consistent, false otherwise
     """
     def forwardChecking ( self ):
-        for variable in self.network.variables:
-            if variable.isAssigned():
-                for neighbor in self.network.getNeighborsOfVariable(variable):
-                    if variable.getAssignment() == neighbor.getAssignment():
-                        return False
-                    if not neighbor.isAssigned() and variable.getAssignment() in neighbor.getValues():
-                        self.trail.push(neighbor)
-                        neighbor.removeValueFromDomain(variable.getAssignment())
-                        if neighbor.size() == 0:
+        # Propagators can prune neighbors of assigned variables, so the
+        # sweep repeats until they change nothing
+        while True:
+            for variable in self.network.variables:
+                if variable.isAssigned():
+                    for neighbor in self.network.getNeighborsOfVariable(variable):
+                        if variable.getAssignment() == neighbor.getAssignment():
+                            self.weighConflict(variable, neighbor)
+                            self.noteFailure(variable, neighbor)
                             return False
-                        
-                        for c in self.network.getModifiedConstraints():
-                            if not c.isConsistent():
+                        if not neighbor.isAssigned() and variable.getAssignment() in neighbor.getValues():
+                            self.trail.push(neighbor)
+                            neighbor.removeValueFromDomain(variable.getAssignment())
+                            if self.nogoods is not None:
+                                self.noteReason((neighbor, variable.getAssignment()), variable)
+                            if neighbor.size() == 0:
+                                self.weighConflict(variable, neighbor)
+                                self.noteFailure(variable, neighbor)
                                 return False
-                        
-        return True
+
+                            for c in self.network.getModifiedConstraints():
+                                if not c.isConsistent():
+                                    c.incrementWeight()
+                                    self.noteConstraintFailure(c)
+                                    return False
+
+            if not self.network.propagators:
+                return True
+            changed = self.propagateConstraints()
+            if changed == None:
+                return False
+            if not changed:
+                return True
 
     """
         Part 2 TODO: Implement both of Norvig's Heuristics
@@ -89,37 +136,68 @@ class BTSolver:
                     and set that cell to I
     """
     def norvigCheck ( self ):
-        for variable in self.network.variables:
-            if variable.isAssigned():
-                for neighbor in self.network.getNeighborsOfVariable(variable):
-                    if variable.getAssignment() == neighbor.getAssignment():
-                        return False
-                    if not neighbor.isAssigned() and variable.getAssignment() in neighbor.getValues():
-                        self.trail.push(neighbor)
-                        neighbor.removeValueFromDomain(variable.getAssignment())
-                        if neighbor.size() == 0:
+        n = self.gameboard.p*self.gameboard.q
+        while True:
+            for variable in self.network.variables:
+                if variable.isAssigned():
+                    for neighbor in self.network.getNeighborsOfVariable(variable):
+                        if variable.getAssignment() == neighbor.getAssignment():
+                            self.weighConflict(variable, neighbor)
+                            self.noteFailure(variable, neighbor)
                             return False
-                        
-                        for c in self.network.getModifiedConstraints():
-                            if not c.isConsistent():
+                        if not neighbor.isAssigned() and variable.getAssignment() in neighbor.getValues():
+                            self.trail.push(neighbor)
+                            neighbor.removeValueFromDomain(variable.getAssignment())
+                            if self.nogoods is not None:
+                                self.noteReason((neighbor, variable.getAssignment()), variable)
+                            if neighbor.size() == 0:
+                                self.weighConflict(variable, neighbor)
+                                self.noteFailure(variable, neighbor)
                                 return False
-                            
-        n = self.gameboard.p*self.gameboard.q
-        for c in self.network.getConstraints():
-            counter = [0 for i in range(n)]
-            for i in range(n):
-                for value in c.vars[i].getValues():
-                    counter[value-1] += 1
-            for i in range(n):
-                if counter[i] == 1:
-                    for variable in c.vars:
-                        if variable.getDomain().contains(i+1):
-                            variable.assignValue(i+1)
-                            
-                            for constraint in self.network.getModifiedConstraints():
-                                if not constraint.isConsistent():
+
+                            for c in self.network.getModifiedConstraints():
+                                if not c.isConsistent():
+                                    c.incrementWeight()
+                                    self.noteConstraintFailure(c)
                                     return False
-        return True
+
+            # Hidden singles are assigned like decisions, so they are trailed
+            # and the sweep above runs again to propagate them
+            assigned = False
+            for c in self.network.units:
+                counter = [0 for i in range(n)]
+                for i in range(n):
+                    for value in c.vars[i].getValues():
+                        counter[value-1] += 1
+                for i in range(n):
+                    if counter[i] == 0:
+                        c.incrementWeight()
+                        self.conflict = None
+                        return False
+                    if counter[i] == 1:
+                        for variable in c.vars:
+                            if variable.getDomain().contains(i+1):
+                                if not variable.isAssigned():
+                                    if self.nogoods is not None:
+                                        self.noteReason((variable, 0), (c, i+1))
+                                    self.trail.push(variable)
+                                    variable.assignValue(i+1)
+                                    assigned = True
+
+                                for constraint in self.network.getModifiedConstraints():
+                                    if not constraint.isConsistent():
+                                        constraint.incrementWeight()
+                                        self.noteConstraintFailure(constraint)
+                                        return False
+
+            if self.network.propagators:
+                changed = self.propagateConstraints()
+                if changed == None:
+                    return False
+                assigned = assigned or changed
+
+            if not assigned:
+                return True
 
     """
          Optional TODO: Implement your own advanced Constraint Propagation
@@ -128,8 +206,120 @@ class BTSolver:
          your program into a tournament.
      """
     def getTournCC ( self ):
+        return self.norvigCheck()
+
+    """
+        Runs the propagators of the network's variant constraints (killer
+        cages). Their prunings carry no reasons, so a failure they cause is
+        left unexplained for nogood learning.
+
+        Return: true if any domain changed, None on a failure
+    """
+    def propagateConstraints ( self ):
+        changed = False
+        for c in self.network.propagators:
+            result = c.propagate( self.trail )
+            if result == None:
+                c.incrementWeight()
+                self.conflict = None
+                return None
+            changed = changed or result
+        return changed
+
+    # Rewards the constraints shared by u and w for causing a failure
+    def weighConflict ( self, u, w ):
+        for c in self.network.getConstraintsContainingVariable( u ):
+            if c.contains( w ):
+                c.incrementWeight()
+
+    # ==================================================================
+    # Nogood Learning
+    # ==================================================================
+
+    """
+        The learning layer keeps, for every value pruned by propagation,
+        the variable whose assignment pruned it, and for every hidden
+        single the unit and value that forced it. Walking these reasons back
+        to the decisions explains a failure with the decisions that caused
+        it, which is usually a much smaller set than the whole path.
+
+        Reasons are journaled next to the trail so that they are dropped
+        exactly when the domain changes they explain are undone.
+    """
+    def noteReason ( self, key, reason ):
+        self.reasons[key] = reason
+        self.reasonJournal.append( key )
+
+    # Records why propagation failed on the clash or wipe-out of u and w
+    def noteFailure ( self, u, w ):
+        if self.nogoods is None:
+            return
+        memo = dict()
+        if w.size() == 0:
+            self.conflict = self.explainDomain( w, memo )
+        else:
+            self.conflict = self.mergeConflict( self.explainAssignment( u, memo ),
+                                                self.explainAssignment( w, memo ) )
+
+    def noteConstraintFailure ( self, c ):
+        if self.nogoods is None:
+            return
+        for u in c.vars:
+            for w in c.vars:
+                if u is not w and u.isAssigned() and u.getAssignment() == w.getAssignment():
+                    self.noteFailure( u, w )
+                    return
+        self.conflict = None
+
+    # Returns the decisions that imply v's current assignment, or None
+    def explainAssignment ( self, v, memo ):
+        if v in memo:
+            return memo[v]
+        memo[v] = None
+
+        if not v.isChangeable():
+            result = frozenset()
+        elif v in self.decisions:
+            result = frozenset( [(v.row, v.col, self.decisions[v])] )
+        elif (v, 0) in self.reasons:
+            c, value = self.reasons[(v, 0)]
+            result = frozenset()
+            for other in c.vars:
+                if other is not v:
+                    result = self.mergeConflict( result, self.explainRemoval( other, value, memo ) )
+        else:
+            result = self.explainDomain( v, memo )
+
+        memo[v] = result
+        return result
+
+    # Returns the decisions that removed value from v's domain, or None
+    def explainRemoval ( self, v, value, memo ):
+        if value in v.getValues():
+            return None
+        cause = self.reasons.get( (v, value) )
+        if cause is not None:
+            return self.explainAssignment( cause, memo )
+        if v.isAssigned():
+            return self.explainAssignment( v, memo )
         return None
 
+    # Returns the decisions that removed every missing value of v's domain
+    def explainDomain ( self, v, memo ):
+        result = frozenset()
+        for value in range( 1, self.gameboard.p*self.gameboard.q + 1 ):
+            if result is None:
+                break
+            if value not in v.getValues():
+                result = self.mergeConflict( result, self.explainRemoval( v, value, memo ) )
+        return result
+
+    # Unions two explanations, an unknown (None) explanation absorbs the other
+    def mergeConflict ( self, a, b ):
+        if a is None or b is None:
+            return None
+        return a | b
+
     # ==================================================================
     # Variable Selectors
     # ==================================================================
@@ -199,10 +389,40 @@ class BTSolver:
                     degree = unassigned
                 elif variable.size() < domain:
                     v  = variable
+                    domain = variable.size()
                     degree = unassigned
                     
         return v
 
+    """
+        Conflict-directed dom/wdeg Heuristic
+
+        Every constraint carries a weight that is incremented each time it
+        causes a wipe-out or an inconsistency during propagation. The
+        weighted degree of a variable is the sum of the weights of its
+        constraints that still involve another unassigned variable. The
+        weights live on the constraints, so they survive backtracking.
+
+        Return: The unassigned variable with the smallest ratio of domain
+                size to weighted degree
+    """
+    def getDomWdeg ( self ):
+        v = None
+        ratio = float("inf")
+        for variable in self.network.variables:
+            if not variable.isAssigned():
+                wdeg = 0
+                for c in self.network.getConstraintsContainingVariable( variable ):
+                    for other in c.vars:
+                        if other is not variable and not other.isAssigned():
+                            wdeg += c.getWeight()
+                            break
+                r = variable.size() / wdeg if wdeg > 0 else float("inf")
+                if v == None or r < ratio:
+                    v = variable
+                    ratio = r
+        return v
+
     """
          Optional TODO: Implement your own advanced Variable Heuristic
 
@@ -210,7 +430,7 @@ class BTSolver:
          your program into a tournament.
      """
     def getTournVar ( self ):
-        return None
+        return self.getDomWdeg()
 
     # ==================================================================
     # Value Selectors
@@ -248,7 +468,7 @@ class BTSolver:
          your program into a tournament.
      """
     def getTournVal ( self, v ):
-        return None
+        return self.getValuesLCVOrder( v )
 
     # ==================================================================
     # Engine Functions
@@ -273,6 +493,10 @@ class BTSolver:
             self.hassolution = True
             return
 
+        if self.nogoods is not None:
+            self.learnSolve( v )
+            return
+
         # Attempt to assign a value
         for i in self.getNextValues( v ):
 
@@ -294,44 +518,240 @@ class BTSolver:
             # Otherwise backtrack
             self.trail.undo()
 
-    def checkConsistency ( self ):
-        if self.cChecks == "forwardChecking":
-            return self.forwardChecking()
+    """
+        Value loop of solve with nogood learning. Values ruled out by a
+        stored nogood are skipped, each failed child records the decisions
+        that explain its failure, and self.conflict is left holding the
+        explanation of this node's failure for the parent to learn from.
+    """
+    def learnSolve ( self, v ):
+        values = self.getNextValues( v )
 
-        if self.cChecks == "norvigCheck":
-            return self.norvigCheck()
+        # Values held back by the value selector cannot be explained
+        conflict = self.explainDomain( v, dict() ) if len( values ) == v.size() else None
 
-        if self.cChecks == "tournCC":
-            return self.getTournCC()
+        for i in values:
+            literal = (v.row, v.col, i)
+            nogood = self.nogoods.findViolated( literal, self.path )
+            if nogood is not None:
+                conflict = self.mergeConflict( conflict, nogood - {literal} )
+                continue
 
-        else:
-            return self.assignmentsCheck()
+            self.trail.placeTrailMarker()
+            self.trail.push( v )
+            self.reasonMarkers.append( len( self.reasonJournal ) )
+            self.decisions[v] = i
+            self.path.add( literal )
 
-    def selectNextVariable ( self ):
-        if self.varHeuristics == "MinimumRemainingValue":
-            return self.getMRV()
+            v.assignValue( i )
 
-        if self.varHeuristics == "Degree":
-            return self.getDegree()
+            self.conflict = None
+            if self.checkConsistency():
+                self.solve()
 
-        if self.varHeuristics == "MRVwithTieBreaker":
-            return self.MRVwithTieBreaker()
+            if self.hassolution:
+                return
 
-        if self.varHeuristics == "tournVar":
-            return self.getTournVar()
+            if self.conflict is not None:
+                self.nogoods.record( self.conflict )
+                conflict = self.mergeConflict( conflict, self.conflict - {literal} )
+            else:
+                conflict = None
 
-        else:
-            return self.getfirstUnassignedVariable()
+            self.trail.undo()
+            marker = self.reasonMarkers.pop()
+            while len( self.reasonJournal ) > marker:
+                self.reasons.pop( self.reasonJournal.pop(), None )
+            del self.decisions[v]
+            self.path.discard( literal )
 
-    def getNextValues ( self, v ):
-        if self.valHeuristics == "LeastConstrainingValue":
-            return self.getValuesLCVOrder( v )
+        self.conflict = conflict
 
-        if self.valHeuristics == "tournVal":
-            return self.getTournVal( v )
+    """
+        Counts the solutions below the current state, stopping once limit
+        solutions were found when a limit is given. Every assignment made
+        is undone, so the network is left as it was found.
+    """
+    def countSolutions ( self, limit = None ):
+        v = self.selectNextVariable()
+        if v == None:
+            return 1
 
-        else:
-            return self.getValuesInOrder( v )
+        count = 0
+        for i in self.getNextValues( v ):
+            self.trail.placeTrailMarker()
+            self.trail.push( v )
+            v.assignValue( i )
+
+            if self.checkConsistency():
+                count += self.countSolutions( None if limit == None else limit - count )
+
+            self.trail.undo()
+            if limit != None and count >= limit:
+                break
+        return count
+
+    """
+        Makes the decisions of a path, given as (row, col, value) triples,
+        the way solve would, each behind its own trail marker.
+
+        Return: false if one of them is inconsistent
+    """
+    def replayAssignments ( self, path ):
+        n = self.gameboard.p*self.gameboard.q
+        for row, col, value in path:
+            v = self.network.variables[row*n + col]
+            self.trail.placeTrailMarker()
+            self.trail.push( v )
+            v.assignValue( value )
+            if not self.checkConsistency():
+                return False
+        return True
+
+    """
+        Binds checkConsistency, selectNextVariable and getNextValues to the
+        methods named by the heuristic strings, once, so that the search
+        does not compare strings at every node. Unknown or empty names fall
+        back to the basic check, the first unassigned variable and the
+        default value order.
+    """
+    def resolveHeuristics ( self ):
+        self.checkConsistency = {
+            "forwardChecking" : self.forwardChecking,
+            "norvigCheck"     : self.norvigCheck,
+            "tournCC"         : self.getTournCC,
+        }.get( self.cChecks, self.assignmentsCheck )
+
+        self.selectNextVariable = {
+            "MinimumRemainingValue" : self.getMRV,
+            "Degree"                : self.getDegree,
+            "MRVwithTieBreaker"     : self.MRVwithTieBreaker,
+            "DomWeightedDegree"     : self.getDomWdeg,
+            "tournVar"              : self.getTournVar,
+        }.get( self.varHeuristics, self.getfirstUnassignedVariable )
+
+        self.getNextValues = {
+            "LeastConstrainingValue" : self.getValuesLCVOrder,
+            "tournVal"               : self.getTournVal,
+        }.get( self.valHeuristics, self.getValuesInOrder )
+
+    # ==================================================================
+    # Monitoring
+    # ==================================================================
+
+    """
+        Attaches a SearchMonitor. Monitors replace the engine functions of
+        this instance with wrappers that fire the monitor events, and time
+        every phase when one of them asks for phase timings; a solver
+        without monitors runs the plain methods and pays nothing. Engine
+        functions already overridden on the instance when the first monitor
+        is attached (e.g. by a resume plan) are the ones that get wrapped.
+    """
+    def addMonitor ( self, monitor ):
+        self.monitors.append( monitor )
+        self.instrument()
+
+    # Detaches a monitor; once none remain the plain engine functions are back
+    def removeMonitor ( self, monitor ):
+        self.monitors.remove( monitor )
+        if self.monitors:
+            self.instrument()
+            return
+
+        for name, f in self.engine.items():
+            setattr( self, name, f )
+        self.engine = None
+
+    def instrument ( self ):
+        if self.engine == None:
+            self.engine = { name : getattr( self, name ) for name in
+                            ( "solve", "selectNextVariable", "getNextValues", "checkConsistency" ) }
+
+        monitors = self.monitors
+        phases = []
+        selected = []
+
+        def timed ( name, f, *args ):
+            phases.append( name )
+            path = tuple( phases )
+            start = perf_counter()
+            try:
+                return f( *args )
+            finally:
+                elapsed = perf_counter() - start
+                phases.pop()
+                for m in monitors:
+                    m.onPhase( path, elapsed )
+
+        if not any( m.wantsPhases for m in monitors ):
+            timed = lambda name, f, *args: f( *args )
+
+        solve = self.engine["solve"]
+        select = self.engine["selectNextVariable"]
+        check = self.engine["checkConsistency"]
+
+        def solveHook ( ):
+            outermost = not selected
+            if outermost:
+                self.instrumentTrail( timed )
+                start = perf_counter()
+            selected.append( None )
+            try:
+                solve()
+            finally:
+                selected.pop()
+                if outermost:
+                    self.uninstrumentTrail()
+                    for m in monitors:
+                        m.onFinish( self, perf_counter() - start )
+
+        # Outside solve (countSolutions, replayAssignments) there is no
+        # node to report, so the plain engine functions run
+        def selectHook ( ):
+            if not selected:
+                return select()
+            v = timed( "selectNextVariable", select )
+            selected[-1] = v
+            for m in monitors:
+                m.onNode( self, v )
+            return v
+
+        def checkHook ( ):
+            if not selected:
+                return check()
+            v = selected[-1]
+            for m in monitors:
+                m.onAssign( self, v, v.getAssignment() )
+            consistent = timed( "checkConsistency", check )
+            if not consistent:
+                for m in monitors:
+                    m.onWipeout( self, v )
+            return consistent
+
+        self.solve = solveHook
+        self.selectNextVariable = selectHook
+        self.getNextValues = lambda v, f = self.engine["getNextValues"]: timed( "getNextValues", f, v )
+        self.checkConsistency = checkHook
+
+    # The trail may be shared between solvers, so it is only wrapped while solving
+    def instrumentTrail ( self, timed ):
+        trail = self.trail
+        placeTrailMarker = trail.placeTrailMarker
+        push = trail.push
+        undo = trail.undo
+
+        def undoHook ( ):
+            timed( "trail.undo", undo )
+            for m in self.monitors:
+                m.onBacktrack( self )
+
+        trail.placeTrailMarker = lambda: timed( "trail.placeTrailMarker", placeTrailMarker )
+        trail.push = lambda v: timed( "trail.push", push, v )
+        trail.undo = undoHook
+
+    def uninstrumentTrail ( self ):
+        for name in ( "placeTrailMarker", "push", "undo" ):
+            self.trail.__dict__.pop( name, None )
 
     def getSolution ( self ):
         return self.network.toSudokuBoard(self.gameboard.p, self.gameboard.q)
@@ -0,0 +1,340 @@
+import itertools
+
+"""
+    Compact bitmask representation of a Sudoku board, used where building a
+    ConstraintNetwork would cost more than the work itself (generation,
+    uniqueness checks, preprocessing, validation).
+
+    Cells are indexed row-major from 0 to N*N-1. Each cell holds its value
+    (0 if empty) and a candidate mask in which bit v-1 stands for value v.
+
+    The module functions working on a values list and a masks list (placing
+    a value, eliminating candidates, hidden singles, locked candidates and
+    naked subsets) take the units or peers to use as arguments, so the
+    Preprocessor and the DifficultyRater (whose units come from the
+    ConstraintNetwork and include variant constraints) share them.
+"""
+
+# Units and peers of every p x q shape built so far, keyed by (p, q)
+TOPOLOGIES = dict()
+
+def getTopology ( p, q ):
+    key = (p, q)
+    if key not in TOPOLOGIES:
+        n = p*q
+        units = []
+        for r in range(n):
+            units.append( [r*n + c for c in range(n)] )
+        for c in range(n):
+            units.append( [r*n + c for r in range(n)] )
+        for br in range(0, n, p):
+            for bc in range(0, n, q):
+                units.append( [(br+r)*n + bc+c for r in range(p) for c in range(q)] )
+
+        cellUnits = [[] for i in range(n*n)]
+        for u in units:
+            for i in u:
+                cellUnits[i].append( u )
+
+        peers = []
+        for i in range(n*n):
+            s = set()
+            for u in cellUnits[i]:
+                s.update( u )
+            s.discard( i )
+            peers.append( sorted( s ) )
+
+        TOPOLOGIES[key] = (units, peers, cellUnits, unitOverlaps( units ))
+    return TOPOLOGIES[key]
+
+"""
+    Pairs of units sharing more than one cell, for locked candidates: a
+    list of (cells of a, set of the cells of b, set of the cells of a).
+"""
+def unitOverlaps ( units ):
+    overlaps = []
+    for a in units:
+        for b in units:
+            if a is not b and len( set( a ) & set( b ) ) > 1:
+                overlaps.append( (a, frozenset( b ), frozenset( a )) )
+    return overlaps
+
+def popcount ( m ):
+    return bin( m ).count( "1" )
+
+# Returns the values whose bits are set in m, in increasing order
+def maskValues ( m ):
+    values = []
+    v = 1
+    while m:
+        if m & 1:
+            values.append( v )
+        m >>= 1
+        v += 1
+    return values
+
+class BitBoard:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, p, q, grid = None ):
+        self.p = p
+        self.q = q
+        self.N = p*q
+        self.units, self.peers, self.cellUnits, self.overlaps = getTopology( p, q )
+        self.full = (1 << self.N) - 1
+
+        self.values = [0] * (self.N*self.N)
+        self.masks = [self.full] * (self.N*self.N)
+        self.consistent = True
+
+        if grid != None:
+            for r in range(self.N):
+                for c in range(self.N):
+                    if grid[r][c] != 0 and not self.place( self.values, self.masks, r*self.N + c, grid[r][c] ):
+                        self.consistent = False
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def toGrid ( self, values = None ):
+        if values == None:
+            values = self.values
+        n = self.N
+        return [values[r*n:(r+1)*n] for r in range(n)]
+
+    def isSolved ( self ):
+        return 0 not in self.values
+
+    # ==================================================================
+    # Search
+    # ==================================================================
+
+    """
+        Returns the number of solutions, stopping once limit is reached.
+        countSolutions(2) == 1 is the uniqueness check.
+    """
+    def countSolutions ( self, limit = 2 ):
+        if not self.consistent:
+            return 0
+        return self.search( self.values[:], self.masks[:], limit, None, None )
+
+    """
+        Returns one solution grid, or None. With rng the values of every
+        choice point are tried in random order, which gives a uniformly
+        shuffled full grid when started from an empty board.
+    """
+    def findSolution ( self, rng = None ):
+        if not self.consistent:
+            return None
+        found = []
+        self.search( self.values[:], self.masks[:], 1, rng, found )
+        return self.toGrid( found[0] ) if found else None
+
+    # Assigns value to cell i and removes it from the peers' candidates
+    def place ( self, values, masks, i, value ):
+        return placeValue( self.peers[i], values, masks, i, value )
+
+    # Places naked and hidden singles until none are left
+    def propagate ( self, values, masks ):
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(values)):
+                if not values[i]:
+                    m = masks[i]
+                    if not m:
+                        return False
+                    if not m & (m - 1):
+                        if not self.place( values, masks, i, m.bit_length() ):
+                            return False
+                        changed = True
+
+            for u in self.units:
+                once = hiddenValues( u, values, masks, self.full )
+                if once == None:
+                    return False
+                while once:
+                    bit = once & -once
+                    once ^= bit
+                    for i in u:
+                        if masks[i] & bit:
+                            if not self.place( values, masks, i, bit.bit_length() ):
+                                return False
+                            changed = True
+                            break
+        return True
+
+    def search ( self, values, masks, limit, rng, found ):
+        if not self.propagate( values, masks ):
+            return 0
+
+        best = -1
+        bestSize = self.N + 1
+        for i in range(len(values)):
+            if not values[i]:
+                size = popcount( masks[i] )
+                if size < bestSize:
+                    best = i
+                    bestSize = size
+                    if size == 2:
+                        break
+
+        if best == -1:
+            if found != None:
+                found.append( values )
+            return 1
+
+        candidates = maskValues( masks[best] )
+        if rng != None:
+            rng.shuffle( candidates )
+
+        count = 0
+        for value in candidates:
+            v = values[:]
+            m = masks[:]
+            if self.place( v, m, best, value ):
+                count += self.search( v, m, limit - count, rng, found )
+                if count >= limit:
+                    break
+        return count
+
+# ==================================================================
+# Candidate Primitives
+# ==================================================================
+
+# Assigns value to cell i and removes it from the candidates of peers, the
+# cells that see i. Returns false on a contradiction.
+def placeValue ( peers, values, masks, i, value ):
+    bit = 1 << (value - 1)
+    if not masks[i] & bit:
+        return False
+    values[i] = value
+    masks[i] = bit
+    for j in peers:
+        if masks[j] & bit:
+            if values[j]:
+                return False
+            masks[j] &= ~bit
+            if not masks[j]:
+                return False
+    return True
+
+# Removes the bits of m from the empty cells of cells outside keep.
+# Returns true if anything changed, None on a wipe-out.
+def eliminate ( values, masks, cells, keep, m ):
+    changed = False
+    for i in cells:
+        if not values[i] and i not in keep and masks[i] & m:
+            masks[i] &= ~m
+            if not masks[i]:
+                return None
+            changed = True
+    return changed
+
+"""
+    Returns the mask of the values with exactly one open place in unit u
+    (hidden singles), or None if a value of full has no place left in u.
+"""
+def hiddenValues ( u, values, masks, full ):
+    seen = 0
+    twice = 0
+    placed = 0
+    for i in u:
+        m = masks[i]
+        twice |= seen & m
+        seen |= m
+        if values[i]:
+            placed |= m
+    if seen != full:
+        return None
+    return seen & ~twice & ~placed
+
+"""
+    If all the candidates for a value in one unit lie in a second unit
+    they overlap with, the value goes nowhere else in the second unit
+    (pointing and claiming). overlaps comes from unitOverlaps. With once
+    it returns after the first change. Returns true if anything changed,
+    None on a wipe-out.
+"""
+def lockedCandidates ( overlaps, values, masks, once = False ):
+    changed = False
+    for a, b, inside in overlaps:
+        m = 0
+        for i in a:
+            if not values[i]:
+                m |= masks[i]
+        while m:
+            bit = m & -m
+            m ^= bit
+            if all( i in b for i in a if not values[i] and masks[i] & bit ):
+                result = eliminate( values, masks, b, inside, bit )
+                if result == None:
+                    return None
+                if result:
+                    if once:
+                        return True
+                    changed = True
+    return changed
+
+"""
+    k cells of a unit whose candidates number k own those values. With
+    once it returns after the first change. Returns true if anything
+    changed, None on a wipe-out.
+"""
+def nakedSubsets ( units, values, masks, k, once = False ):
+    changed = False
+    for u in units:
+        cells = [i for i in u if not values[i] and 2 <= popcount( masks[i] ) <= k]
+        if len( cells ) < k:
+            continue
+        for subset in itertools.combinations( cells, k ):
+            m = 0
+            for i in subset:
+                m |= masks[i]
+            if popcount( m ) == k:
+                result = eliminate( values, masks, u, subset, m )
+                if result == None:
+                    return None
+                if result:
+                    if once:
+                        return True
+                    changed = True
+    return changed
+
+"""
+    Checks that grid is a complete valid solution of a p x q board and, when
+    clues are given, that it agrees with every clue. Each unit must cover
+    all N values exactly once, which is checked with one mask per unit.
+"""
+def isValidSolution ( p, q, grid, clues = None ):
+    n = p*q
+    if len( grid ) != n:
+        return False
+
+    full = (1 << n) - 1
+    rows = [0] * n
+    cols = [0] * n
+    blocks = [0] * n
+    for r in range(n):
+        line = grid[r]
+        if len( line ) != n:
+            return False
+        clueLine = clues[r] if clues != None else None
+        for c in range(n):
+            value = line[c]
+            if value < 1 or value > n:
+                return False
+            if clueLine != None and clueLine[c] != 0 and clueLine[c] != value:
+                return False
+            bit = 1 << (value - 1)
+            b = (r // p) * p + c // q
+            if rows[r] & bit or cols[c] & bit or blocks[b] & bit:
+                return False
+            rows[r] |= bit
+            cols[c] |= bit
+            blocks[b] |= bit
+    return all( m == full for m in rows ) and all( m == full for m in cols ) and all( m == full for m in blocks )
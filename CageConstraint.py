@@ -0,0 +1,132 @@
+import itertools
+from math import comb
+import Constraint
+
+"""
+    Killer cage: the variables of the cage take different values that add
+    up to total.
+
+    Besides the not-equals part inherited from Constraint, a cage prunes
+    its variables' domains with its own propagator. For cages whose value
+    combinations are few enough, the combinations of distinct values with
+    the right sum are precomputed once per (N, size, total) as bitmasks, and
+    a value is kept only if some combination agreeing with the assigned
+    cells and the open domains contains it. Larger cages fall back to sum
+    bounds on the values the open cells can still take.
+"""
+
+# Precomputed combination tables, keyed by (N, size, total)
+COMBINATIONS = dict()
+
+# Largest number of candidate combinations a table is built for
+TABLE_LIMIT = 20000
+
+def getCombinations ( n, size, total ):
+    key = (n, size, total)
+    if key not in COMBINATIONS:
+        table = None
+        if comb( n, size ) <= TABLE_LIMIT:
+            table = []
+            for values in itertools.combinations( range( 1, n+1 ), size ):
+                if sum( values ) == total:
+                    mask = 0
+                    for value in values:
+                        mask |= 1 << (value - 1)
+                    table.append( mask )
+        COMBINATIONS[key] = table
+    return COMBINATIONS[key]
+
+class CageConstraint ( Constraint.Constraint ):
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, total, n ):
+        Constraint.Constraint.__init__( self )
+        self.total = total
+        self.N = n
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def isConsistent ( self ):
+        if not Constraint.Constraint.isConsistent( self ):
+            return False
+
+        assigned = 0
+        free = 0
+        for v in self.vars:
+            if v.isAssigned():
+                assigned += v.getAssignment()
+            else:
+                free += 1
+        if free == 0:
+            return assigned == self.total
+        return assigned + free*(free + 1)//2 <= self.total
+
+    # ==================================================================
+    # Propagation
+    # ==================================================================
+
+    """
+        Removes the values that cannot be part of a valid sum from the
+        domains of the cage's unassigned variables, pushing them on trail
+        first. Returns true if any domain changed, None on a failure.
+    """
+    def propagate ( self, trail ):
+        assigned = 0
+        total = 0
+        avail = 0
+        free = []
+        for v in self.vars:
+            if v.isAssigned():
+                bit = 1 << (v.getAssignment() - 1)
+                if assigned & bit:
+                    return None
+                assigned |= bit
+                total += v.getAssignment()
+            else:
+                free.append( v )
+                for value in v.getValues():
+                    avail |= 1 << (value - 1)
+
+        if not free:
+            return False if total == self.total else None
+
+        table = getCombinations( self.N, len( self.vars ), self.total )
+        if table != None:
+            allowed = 0
+            for m in table:
+                if m & assigned == assigned and (m & ~assigned) & ~avail == 0:
+                    allowed |= m
+            allowed &= ~assigned
+        else:
+            allowed = self.boundedValues( self.total - total, len( free ), avail & ~assigned )
+
+        changed = False
+        for v in free:
+            removed = [value for value in v.getValues() if not allowed >> (value - 1) & 1]
+            if removed:
+                trail.push( v )
+                for value in removed:
+                    v.removeValueFromDomain( value )
+                if v.size() == 0:
+                    return None
+                changed = True
+        return changed
+
+    # Values x for which the other k-1 open cells can still make up rest - x
+    def boundedValues ( self, rest, k, avail ):
+        values = [value for value in range( 1, self.N+1 ) if avail >> (value - 1) & 1]
+        allowed = 0
+        for x in values:
+            others = [value for value in values if value != x]
+            if len( others ) < k - 1:
+                continue
+            low = sum( others[:k-1] )
+            high = sum( others[len( others )-(k-1):] ) if k > 1 else 0
+            if low <= rest - x <= high:
+                allowed |= 1 << (x - 1)
+        return allowed
@@ -0,0 +1,335 @@
+import heapq
+
+"""
+    Small conflict-driven clause learning SAT solver.
+
+    Variables are numbered from 1 and literals are signed integers, as in
+    DIMACS. The solver keeps two watched literals per clause, learns a
+    first-UIP clause from every conflict and backjumps to its second
+    highest level, picks decision variables by activity (bumped for the
+    variables of every conflict, VSIDS style) with saved phases, and
+    restarts on a Luby schedule.
+
+        solver = CdclSolver()
+        solver.addClause( [1, -2] )
+        if solver.solve():
+            solver.getValue( 2 )
+"""
+
+# Conflicts in one unit of the Luby restart schedule
+RESTART_BASE = 100
+
+# i-th term (from 0) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...
+def luby ( i ):
+    size = 1
+    seq = 0
+    while size < i + 1:
+        seq += 1
+        size = 2*size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+    return 1 << seq
+
+class CdclSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, numVars = 0 ):
+        self.numVars = 0
+        self.ok = True
+
+        # Indexed by variable: 0 unassigned, 1 true, -1 false
+        self.values = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.seen = [False]
+
+        # Indexed by literal code, see code(): clauses watching that literal
+        self.watches = [[], []]
+
+        self.clauses = []
+        self.learnts = []
+        self.trail = []
+        self.trailLim = []
+        self.qhead = 0
+
+        self.heap = []
+        self.bump = 1.0
+        self.decay = 0.95
+
+        self.numDecisions = 0
+        self.numConflicts = 0
+        self.numRestarts = 0
+
+        self.newVars( numVars )
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Makes sure variables 1..n exist
+    def newVars ( self, n ):
+        while self.numVars < n:
+            self.numVars += 1
+            self.values.append( 0 )
+            self.level.append( 0 )
+            self.reason.append( None )
+            self.activity.append( 0.0 )
+            self.phase.append( False )
+            self.seen.append( False )
+            self.watches.append( [] )
+            self.watches.append( [] )
+            heapq.heappush( self.heap, (0.0, self.numVars) )
+
+    """
+        Adds a clause before solving. Returns false once the clauses are
+        known to be unsatisfiable.
+    """
+    def addClause ( self, lits ):
+        if not self.ok:
+            return False
+
+        clause = []
+        for l in lits:
+            self.newVars( abs( l ) )
+            value = self.litValue( l )
+            if value == 1 or -l in clause:
+                return True
+            if value == 0 and l not in clause:
+                clause.append( l )
+
+        if not clause:
+            self.ok = False
+        elif len( clause ) == 1:
+            self.enqueue( clause[0], None )
+            self.ok = self.propagate() == None
+        else:
+            self.clauses.append( clause )
+            self.watch( clause )
+        return self.ok
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Value of variable v in the model found by solve
+    def getValue ( self, v ):
+        return self.values[v] == 1
+
+    def litValue ( self, l ):
+        value = self.values[abs( l )]
+        return value if l > 0 else -value
+
+    # Index of literal l in watches
+    def code ( self, l ):
+        return 2*l if l > 0 else -2*l + 1
+
+    # ==================================================================
+    # Solving
+    # ==================================================================
+
+    """
+        Returns true if the clauses are satisfiable (the model is then
+        read with getValue), false if not, and None if maxConflicts
+        conflicts went by first.
+    """
+    def solve ( self, maxConflicts = None ):
+        if not self.ok:
+            return False
+
+        restarts = 0
+        budget = luby( restarts ) * RESTART_BASE
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict != None:
+                self.numConflicts += 1
+                conflicts += 1
+                if not self.trailLim:
+                    self.ok = False
+                    return False
+
+                learnt, back = self.analyze( conflict )
+                self.cancelUntil( back )
+                if len( learnt ) == 1:
+                    self.enqueue( learnt[0], None )
+                else:
+                    self.learnts.append( learnt )
+                    self.watch( learnt )
+                    self.enqueue( learnt[0], learnt )
+                self.bump /= self.decay
+
+                if maxConflicts != None and self.numConflicts >= maxConflicts:
+                    self.cancelUntil( 0 )
+                    return None
+
+            elif conflicts >= budget:
+                restarts += 1
+                self.numRestarts += 1
+                budget = luby( restarts ) * RESTART_BASE
+                conflicts = 0
+                self.cancelUntil( 0 )
+
+            else:
+                v = self.pickBranchVariable()
+                if v == None:
+                    return True
+                self.numDecisions += 1
+                self.trailLim.append( len( self.trail ) )
+                self.enqueue( v if self.phase[v] else -v, None )
+
+    def enqueue ( self, l, reason ):
+        v = abs( l )
+        self.values[v] = 1 if l > 0 else -1
+        self.level[v] = len( self.trailLim )
+        self.reason[v] = reason
+        self.trail.append( l )
+
+    def watch ( self, clause ):
+        self.watches[self.code( clause[0] )].append( clause )
+        self.watches[self.code( clause[1] )].append( clause )
+
+    """
+        Unit propagation over the watched literals. The implied literal of
+        a reason clause is always kept at position 0. Returns the clause
+        that became false, or None.
+    """
+    def propagate ( self ):
+        values = self.values
+        trail = self.trail
+        watches = self.watches
+        while self.qhead < len( trail ):
+            false = -trail[self.qhead]
+            self.qhead += 1
+
+            c = self.code( false )
+            watchers = watches[c]
+            kept = []
+            watches[c] = kept
+            for i in range( len( watchers ) ):
+                clause = watchers[i]
+                if clause[0] == false:
+                    clause[0] = clause[1]
+                    clause[1] = false
+
+                first = clause[0]
+                firstValue = values[abs( first )] if first > 0 else -values[abs( first )]
+                if firstValue == 1:
+                    kept.append( clause )
+                    continue
+
+                moved = False
+                for k in range( 2, len( clause ) ):
+                    l = clause[k]
+                    value = values[abs( l )] if l > 0 else -values[abs( l )]
+                    if value != -1:
+                        clause[1] = l
+                        clause[k] = false
+                        watches[self.code( l )].append( clause )
+                        moved = True
+                        break
+                if moved:
+                    continue
+
+                kept.append( clause )
+                if firstValue == -1:
+                    kept.extend( watchers[i+1:] )
+                    self.qhead = len( trail )
+                    return clause
+                self.enqueue( first, clause )
+        return None
+
+    """
+        First-UIP conflict analysis. Returns the learnt clause, its
+        asserting literal first and a literal of the backjump level second,
+        and the level to backjump to.
+    """
+    def analyze ( self, conflict ):
+        seen = self.seen
+        level = self.level
+        current = len( self.trailLim )
+        learnt = [None]
+        pending = 0
+        p = None
+        index = len( self.trail ) - 1
+        clause = conflict
+
+        while True:
+            for q in (clause if p == None else clause[1:]):
+                v = abs( q )
+                if not seen[v] and level[v] > 0:
+                    seen[v] = True
+                    self.bumpVariable( v )
+                    if level[v] >= current:
+                        pending += 1
+                    else:
+                        learnt.append( q )
+
+            while not seen[abs( self.trail[index] )]:
+                index -= 1
+            p = self.trail[index]
+            index -= 1
+            seen[abs( p )] = False
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[abs( p )]
+
+        learnt[0] = -p
+        for q in learnt[1:]:
+            seen[abs( q )] = False
+
+        back = 0
+        if len( learnt ) > 1:
+            best = 1
+            for k in range( 2, len( learnt ) ):
+                if level[abs( learnt[k] )] > level[abs( learnt[best] )]:
+                    best = k
+            learnt[1], learnt[best] = learnt[best], learnt[1]
+            back = level[abs( learnt[1] )]
+        return learnt, back
+
+    # Undoes every assignment above level, saving the phases
+    def cancelUntil ( self, level ):
+        if len( self.trailLim ) <= level:
+            return
+        start = self.trailLim[level]
+        for l in self.trail[start:]:
+            v = abs( l )
+            self.phase[v] = l > 0
+            self.values[v] = 0
+            self.reason[v] = None
+            heapq.heappush( self.heap, (-self.activity[v], v) )
+        del self.trail[start:]
+        del self.trailLim[level:]
+        self.qhead = len( self.trail )
+
+    # ==================================================================
+    # Decisions
+    # ==================================================================
+
+    # The unassigned variable with the highest activity, or None
+    def pickBranchVariable ( self ):
+        heap = self.heap
+        while heap:
+            activity, v = heapq.heappop( heap )
+            if self.values[v] == 0:
+                return v
+        return None
+
+    def bumpVariable ( self, v ):
+        self.activity[v] += self.bump
+        if self.activity[v] > 1e100:
+            for i in range( 1, self.numVars + 1 ):
+                self.activity[i] *= 1e-100
+            self.bump *= 1e-100
+            self.heap = [(-self.activity[i], i) for i in range( 1, self.numVars + 1 ) if self.values[i] == 0]
+            heapq.heapify( self.heap )
+        elif self.values[v] == 0:
+            heapq.heappush( self.heap, (-self.activity[v], v) )
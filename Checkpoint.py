@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import SudokuBoard
+import BTSolver
+import Trail
+import NogoodStore
+import SearchMonitor
+
+"""
+    Checkpoint and resume for long BTSolver searches.
+
+    A checkpoint is a small JSON file holding the board and heuristics, the
+    choice point stack (for every open node: its variable, the values
+    already explored and the value being explored), the constraint weights
+    and the learned nogoods, and the trail counters. It is rewritten
+    atomically every interval seconds from a SearchMonitor, and once more
+    if the search is interrupted.
+
+    Resuming rebuilds the solver from the board and replays the stack: at
+    each recorded depth the recorded variable is chosen again, values that
+    were already explored are skipped, and the one that was in progress is
+    tried first. Below the recorded path the search carries on with the
+    normal heuristics.
+"""
+
+VERSION = 1
+
+class CheckpointMonitor ( SearchMonitor.SearchMonitor ):
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, filepath, interval = 5.0, config = ("", "", "") ):
+        self.filepath = filepath
+        self.interval = interval
+        self.config = config
+        self.last = time.perf_counter()
+        self.levels = []
+
+        # Set by a resume plan when it hands out a recorded node
+        self.resumedTried = None
+
+        # Trail counters of the run(s) before this one
+        self.basePushes = 0
+        self.baseBacktracks = 0
+
+    # ==================================================================
+    # Events
+    # ==================================================================
+
+    def onNode ( self, solver, v ):
+        del self.levels[len( solver.trail.trailMarker ):]
+        if v != None:
+            tried = self.resumedTried if self.resumedTried != None else []
+            self.levels.append( [v.row, v.col, list( tried ), None] )
+        self.resumedTried = None
+
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.write( solver )
+            self.last = time.perf_counter()
+
+    def onAssign ( self, solver, v, value ):
+        level = self.levels[len( solver.trail.trailMarker ) - 1]
+        if level[3] != None:
+            level[2].append( level[3] )
+        level[3] = value
+
+    # ==================================================================
+    # Writing
+    # ==================================================================
+
+    def toDict ( self, solver ):
+        trail = solver.trail
+        data = {
+            "version"    : VERSION,
+            "board"      : solver.gameboard.toFileString(),
+            "config"     : list( self.config ),
+            "levels"     : self.levels,
+            "weights"    : [c.getWeight() for c in solver.network.getConstraints()],
+            "pushes"     : self.basePushes + trail.getPushCount() - self.startPushes,
+            "backtracks" : self.baseBacktracks + trail.getUndoCount() - self.startBacktracks,
+        }
+        if solver.nogoods != None:
+            data["nogoods"] = [sorted( ng ) for ng in solver.nogoods.nogoods]
+        return data
+
+    def write ( self, solver ):
+        tmp = self.filepath + ".tmp"
+        with open( tmp, "w" ) as f:
+            json.dump( self.toDict( solver ), f, separators = (",", ":") )
+        os.replace( tmp, self.filepath )
+
+    def attach ( self, solver ):
+        self.startPushes = solver.trail.getPushCount()
+        self.startBacktracks = solver.trail.getUndoCount()
+        solver.addMonitor( self )
+
+# ==================================================================
+# Resume
+# ==================================================================
+
+"""
+    Overrides the solver's variable and value selection so that the first
+    descent follows the recorded levels.
+"""
+def installPlan ( solver, levels, monitor ):
+    select = solver.selectNextVariable
+    nextValues = solver.getNextValues
+    n = solver.gameboard.p*solver.gameboard.q
+    variables = solver.network.variables
+    state = { "next" : 0, "level" : None }
+
+    def onPlan ( k ):
+        if k == 0:
+            return True
+        row, col, tried, current = levels[k-1]
+        return variables[row*n + col].getAssignment() == current
+
+    def planSelect ( ):
+        k = state["next"]
+        if k < len( levels ) and len( solver.trail.trailMarker ) == k and onPlan( k ):
+            state["next"] = k + 1
+            state["level"] = levels[k]
+            monitor.resumedTried = levels[k][2]
+            row, col, tried, current = levels[k]
+            return variables[row*n + col]
+        return select()
+
+    def planValues ( v ):
+        values = nextValues( v )
+        level = state["level"]
+        if level == None:
+            return values
+        state["level"] = None
+
+        row, col, tried, current = level
+        values = [i for i in values if i not in tried and i != current]
+        if current != None and current in v.getValues():
+            values.insert( 0, current )
+        return values
+
+    solver.selectNextVariable = planSelect
+    solver.getNextValues = planValues
+
+# Returns a solver rebuilt from the checkpoint data, with its monitor attached
+def restore ( data, filepath, interval = 5.0, trail = None, monitors = () ):
+    if data.get( "version" ) != VERSION:
+        raise ValueError( "unsupported checkpoint version" )
+
+    val_sh, var_sh, cc = data["config"]
+    board = SudokuBoard.SudokuBoard( text = data["board"] )
+    nogoods = None
+    if "nogoods" in data:
+        nogoods = NogoodStore.NogoodStore()
+        for ng in data["nogoods"]:
+            nogoods.record( tuple( l ) for l in ng )
+
+    solver = BTSolver.BTSolver( board, trail if trail != None else Trail.Trail(), val_sh, var_sh, cc, nogoods )
+    for c, w in zip( solver.network.getConstraints(), data["weights"] ):
+        c.weight = w
+
+    monitor = CheckpointMonitor( filepath, interval, (val_sh, var_sh, cc) )
+    monitor.basePushes = data["pushes"]
+    monitor.baseBacktracks = data["backtracks"]
+    installPlan( solver, data["levels"], monitor )
+    monitor.attach( solver )
+    for m in monitors:
+        solver.addMonitor( m )
+    return solver, monitor
+
+"""
+    Solves board while checkpointing to filepath, or resumes from filepath
+    when it already holds a checkpoint (board and heuristics are then taken
+    from the checkpoint). The checkpoint is removed once the search ends
+    and kept, freshly written, if it is interrupted. The other monitors
+    are attached after the checkpoint monitor and only see the search of
+    this run.
+
+    Returns the solver and the push and backtrack counts over all runs.
+"""
+def solveWithCheckpoints ( board, filepath, val_sh = "", var_sh = "", cc = "", nogoods = None,
+                           interval = 5.0, trail = None, monitors = () ):
+    if os.path.isfile( filepath ):
+        with open( filepath ) as f:
+            solver, monitor = restore( json.load( f ), filepath, interval, trail, monitors )
+    else:
+        solver = BTSolver.BTSolver( board, trail if trail != None else Trail.Trail(), val_sh, var_sh, cc, nogoods )
+        monitor = CheckpointMonitor( filepath, interval, (val_sh, var_sh, cc) )
+        monitor.attach( solver )
+        for m in monitors:
+            solver.addMonitor( m )
+
+    try:
+        solver.solve()
+    except BaseException:
+        monitor.write( solver )
+        raise
+
+    data = monitor.toDict( solver )
+    if os.path.isfile( filepath ):
+        os.remove( filepath )
+    return solver, data["pushes"], data["backtracks"]
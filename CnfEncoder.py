@@ -0,0 +1,170 @@
+import SudokuBoard
+import CdclSolver
+
+"""
+    SAT backend: encodes a SudokuBoard into CNF and solves it with the
+    bundled CdclSolver, or writes it in DIMACS for an external solver.
+
+    There is one variable per open cell and value that the givens leave
+    possible, so givens and the values they rule out cost nothing. Every
+    open cell gets an at-least-one and an at-most-one constraint over its
+    values, and every unit the same two per value it is still missing (the
+    cell at-most-one is implied by the rest but cuts the number of
+    conflicts severalfold on large boards). At-most-one constraints over a
+    few literals are pairwise, larger ones use the sequential counter
+    encoding, which needs a linear number of clauses and auxiliary
+    variables instead of a quadratic number of clauses.
+
+    Diagonals, extra units and jigsaw regions are encoded like the other
+    units; killer cages are not supported.
+"""
+
+# Largest at-most-one group encoded pairwise
+PAIRWISE_LIMIT = 12
+
+class CnfEncoder:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, board ):
+        if board.cages:
+            raise ValueError( "the SAT backend does not encode killer cages" )
+
+        self.board = board
+        self.p = board.p
+        self.q = board.q
+        self.N = board.p*board.q
+        self.numVars = 0
+        self.clauses = []
+
+        # (cell, value) -> variable, and variable -> (cell, value)
+        self.vars = dict()
+        self.literals = [None]
+
+        self.encode()
+
+    # ==================================================================
+    # Encoding
+    # ==================================================================
+
+    # Lists of cell indices that must hold different values
+    def units ( self ):
+        n = self.N
+        board = self.board
+        units = [[r*n + c for c in range(n)] for r in range(n)]
+        units += [[r*n + c for r in range(n)] for c in range(n)]
+        if board.regions:
+            units += [[r*n + c for r, c in region] for region in board.regions]
+        else:
+            for br in range(0, n, self.p):
+                for bc in range(0, n, self.q):
+                    units.append( [(br+r)*n + bc+c for r in range(self.p) for c in range(self.q)] )
+        units += [[r*n + c for r, c in unit] for unit in board.units]
+        return units
+
+    def encode ( self ):
+        n = self.N
+        values = [v for row in self.board.board for v in row]
+        units = self.units()
+
+        # Values the givens rule out, per cell
+        taken = [set() for i in range(n*n)]
+        for u in units:
+            given = [values[i] for i in u if values[i] != 0]
+            if len( given ) != len( set( given ) ):
+                self.clauses.append( [] )
+                return
+            for i in u:
+                taken[i].update( given )
+
+        for i in range(n*n):
+            if values[i] == 0:
+                cell = []
+                for value in range( 1, n+1 ):
+                    if value not in taken[i]:
+                        cell.append( self.newVar( (i, value) ) )
+                self.clauses.append( cell )
+                self.atMostOne( cell )
+
+        for u in units:
+            placed = set( values[i] for i in u )
+            for value in range( 1, n+1 ):
+                if value in placed:
+                    continue
+                group = [self.vars[(i, value)] for i in u if (i, value) in self.vars]
+                if len( u ) == n:
+                    self.clauses.append( group )
+                self.atMostOne( group )
+
+    def newVar ( self, key = None ):
+        self.numVars += 1
+        self.literals.append( key )
+        if key != None:
+            self.vars[key] = self.numVars
+        return self.numVars
+
+    def atMostOne ( self, group ):
+        if len( group ) <= PAIRWISE_LIMIT:
+            for a in range( len( group ) ):
+                for b in range( a+1, len( group ) ):
+                    self.clauses.append( [-group[a], -group[b]] )
+            return
+
+        # s[i] is true once one of group[0..i] is true
+        s = [self.newVar() for i in range( len( group ) - 1 )]
+        self.clauses.append( [-group[0], s[0]] )
+        for i in range( 1, len( group ) - 1 ):
+            self.clauses.append( [-group[i], s[i]] )
+            self.clauses.append( [-s[i-1], s[i]] )
+            self.clauses.append( [-group[i], -s[i-1]] )
+        self.clauses.append( [-group[-1], -s[-1]] )
+
+    # ==================================================================
+    # Solving
+    # ==================================================================
+
+    # Returns the solution as a SudokuBoard, or None if there is none
+    def solve ( self ):
+        self.solver = CdclSolver.CdclSolver( self.numVars )
+        for clause in self.clauses:
+            if not self.solver.addClause( clause ):
+                return None
+        if not self.solver.solve():
+            return None
+        return self.decode( self.solver.getValue )
+
+    # Builds the board of a model given as a function from variable to bool
+    def decode ( self, value ):
+        n = self.N
+        grid = [row[:] for row in self.board.board]
+        for v in range( 1, self.numVars + 1 ):
+            key = self.literals[v]
+            if key != None and value( v ):
+                i, digit = key
+                grid[i // n][i % n] = digit
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = grid )
+
+    # ==================================================================
+    # DIMACS
+    # ==================================================================
+
+    def toDimacs ( self ):
+        lines = ["c sudoku " + str(self.p) + "x" + str(self.q),
+                 "p cnf " + str(self.numVars) + " " + str(len( self.clauses ))]
+        for clause in self.clauses:
+            lines.append( " ".join( str(l) for l in clause ) + " 0" )
+        return "\n".join( lines ) + "\n"
+
+    def writeDimacs ( self, filepath ):
+        with open( filepath, "w" ) as f:
+            f.write( self.toDimacs() )
+
+    # Reads the "v ..." lines of a solver's output into a board
+    def decodeDimacsModel ( self, text ):
+        true = set()
+        for line in text.splitlines():
+            if line.startswith( "v " ):
+                true.update( int( l ) for l in line.split()[1:] if int( l ) > 0 )
+        return self.decode( lambda v: v in true )
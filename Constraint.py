@@ -1,5 +1,3 @@
-import Variable
-
 """
     Constraint represents a NotEquals constraint on a set of variables.
     Used to ensure none of the variables contained in the constraint have the same assignment.
@@ -13,6 +11,7 @@ class Constraint:
 
     def __init__ ( self ):
         self.vars = []
+        self.weight = 1
 
     # ==================================================================
     # Modifiers
@@ -21,6 +20,10 @@ class Constraint:
     def addVariable ( self, v ):
         self.vars.append( v )
 
+    # Called when this constraint causes a wipe-out or an inconsistency
+    def incrementWeight ( self ):
+        self.weight += 1
+
     # ==================================================================
     # Accessors
     # ==================================================================
@@ -28,6 +31,9 @@ class Constraint:
     def size ( self ):
         return len(self.vars)
 
+    def getWeight ( self ):
+        return self.weight
+
     # Returns true if v is in the constraint, false otherwise
     def contains ( self, v ):
         return v in self.vars
@@ -1,11 +1,18 @@
 import Variable
 import Constraint
+import CageConstraint
 import SudokuBoard
 from math import floor
 
 """
     CSP representation of the problem. Contains the variables, constraints, and
     many helpful accessors.
+
+    Next to the row, col and block constraints the network holds the
+    board's variant constraints: extra units, jigsaw regions in place of
+    the blocks, and killer cages. units lists the all-different constraints
+    covering N cells (the ones hidden singles apply to), propagators the
+    constraints that prune domains with their own propagate method.
 """
 class ConstraintNetwork:
 
@@ -16,12 +23,21 @@ class ConstraintNetwork:
     def __init__ ( self, sboard = None ):
         self.constraints = []
         self.variables = []
+        self.variableConstraints = dict()
+        self.neighbors = dict()
+        self.units = []
+        self.propagators = []
 
         if sboard != None:
             board = sboard.board
             temp = []
             value = 0
 
+            regionOf = dict()
+            for r, region in enumerate( sboard.regions ):
+                for cell in region:
+                    regionOf[cell] = r
+
             for i in range(sboard.N):
                 for j in range(sboard.N):
                     value = board[i][j]
@@ -34,7 +50,10 @@ class ConstraintNetwork:
                     else:
                         domain.append(value)
 
-                    block = int(((floor(i/sboard.p) * sboard.p) + floor(j/sboard.q)))
+                    if regionOf:
+                        block = regionOf[(i, j)]
+                    else:
+                        block = int(((floor(i/sboard.p) * sboard.p) + floor(j/sboard.q)))
                     temp.append(Variable.Variable(domain,i,j,block))
 
             rows = dict()
@@ -78,6 +97,18 @@ class ConstraintNetwork:
                     c.addVariable(v)
                 self.addConstraint(c)
 
+            for unit in sboard.units:
+                c = Constraint.Constraint()
+                for row, col in unit:
+                    c.addVariable(temp[row*sboard.N + col])
+                self.addConstraint(c)
+
+            for total, cells in sboard.cages:
+                c = CageConstraint.CageConstraint( total, sboard.N )
+                for row, col in cells:
+                    c.addVariable(temp[row*sboard.N + col])
+                self.addConstraint(c)
+
     # ==================================================================
     # Modifiers
     # ==================================================================
@@ -85,11 +116,34 @@ class ConstraintNetwork:
     def addConstraint ( self, c ):
         if c not in self.constraints:
             self.constraints.append( c )
+            for v in c.vars:
+                self.variableConstraints.setdefault( v, [] ).append( c )
+            self.neighbors = dict()
+
+            if isinstance( c, CageConstraint.CageConstraint ):
+                self.propagators.append( c )
+            elif c.size() * c.size() == len( self.variables ):
+                self.units.append( c )
 
     def addVariable ( self, v ):
         if v not in self.variables:
             self.variables.append( v )
 
+    """
+        Loads the givens of another board of the same size into the
+        existing variables and resets the constraint weights, so the network
+        can be reused without rebuilding its variables and constraints.
+    """
+    def reset ( self, sboard ):
+        board = sboard.board
+        n = sboard.N
+        for v in self.variables:
+            value = board[v.row][v.col]
+            v.reset( value if value != 0 else list( range( 1, n+1 ) ) )
+
+        for c in self.constraints:
+            c.weight = 1
+
     # ==================================================================
     # Accessors
     # ==================================================================
@@ -100,17 +154,24 @@ class ConstraintNetwork:
     def getVariables ( self ):
         return self.variables
 
-    # Returns all variables that share a constraint with v
+    # Returns all variables that share a constraint with v, in the order
+    # the constraints list them so that every run sees the same order. The
+    # list is computed once per variable and shared, callers must not
+    # modify it.
     def getNeighborsOfVariable ( self, v ):
-        neighbors = set()
+        neighbors = self.neighbors.get( v )
+        if neighbors == None:
+            found = dict()
 
-        for c in self.constraints:
-            if c.contains( v ):
-                for x in c.vars:
-                    neighbors.add( x )
+            for c in self.constraints:
+                if c.contains( v ):
+                    for x in c.vars:
+                        found[x] = True
 
-        neighbors.remove( v )
-        return list( neighbors )
+            del found[v]
+            neighbors = list( found )
+            self.neighbors[v] = neighbors
+        return neighbors
 
     # Returns true is every constraint is consistent
     def isConsistent ( self ):
@@ -126,11 +187,7 @@ class ConstraintNetwork:
             @param v variable to check
             @return list of constraints that contains v
         """
-        outList = []
-        for c in self.constraints:
-            if c.contains( v ):
-                outList.append( c )
-        return outList
+        return list( self.variableConstraints.get( v, [] ) )
 
     """
         Returns the constraints that contain variables whose domains were
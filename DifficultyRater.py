@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import itertools
+import multiprocessing
+from collections import OrderedDict
+import BitBoard
+import ConstraintNetwork
+import SudokuBoard
+
+"""
+    Rates puzzles by the human techniques needed to solve them, independent
+    of any search heuristic.
+
+    The rater works on the units and neighbors of the board's
+    ConstraintNetwork (so diagonals and jigsaw regions are rated too), with
+    the candidates of every cell kept as a bitmask. At each step it applies
+    the first technique of the ladder that makes progress and starts over
+    from the bottom. A puzzle's score is the score of the hardest technique
+    it needed; when the ladder stalls it needs search and scores
+    SEARCH_SCORE.
+
+    Every candidate state a rating passes through is cached with the rest
+    of its rating, so puzzles that reach a state already rated (the same
+    grid with more or fewer givens, repeated puzzles) stop there.
+"""
+
+# The ladder, easiest first: technique name and score
+TECHNIQUES = [
+    ("hiddenSingle",     1.2),
+    ("nakedSingle",      2.3),
+    ("lockedCandidates", 2.6),
+    ("nakedPair",        3.0),
+    ("xWing",            3.2),
+    ("hiddenPair",       3.4),
+    ("nakedTriple",      3.6),
+    ("swordfish",        3.8),
+    ("hiddenTriple",     4.0),
+    ("xyWing",           4.2),
+    ("nakedQuad",        5.0),
+    ("jellyfish",        5.2),
+    ("hiddenQuad",       5.4),
+    ("simpleColoring",   5.6),
+    ("xyChain",          6.2),
+]
+
+SCORES = dict( TECHNIQUES )
+
+SEARCH_SCORE = 10.0
+
+# Longest xy-chain looked for, in cells
+MAX_CHAIN = 12
+
+class DifficultyRater:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, cacheSize = 100000 ):
+        self.cacheSize = cacheSize
+        self.cache = OrderedDict()
+        self.layouts = dict()
+        self.numHits = 0
+
+        self.techniques = [(name, getattr( self, name )) for name, score in TECHNIQUES]
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def getHitCount ( self ):
+        return self.numHits
+
+    # ==================================================================
+    # Rating
+    # ==================================================================
+
+    """
+        Returns the rating of board as a dict:
+
+            score       score of the hardest technique needed, None if the
+                        givens contradict each other
+            techniques  how many times each technique was applied
+            solved      true if the ladder alone solved the board
+    """
+    def rate ( self, board ):
+        layout = self.layoutFor( board )
+        n = board.N
+        values = [0] * (n*n)
+        masks = [(1 << n) - 1] * (n*n)
+        consistent = True
+        for r in range(n):
+            for c in range(n):
+                if board.board[r][c] != 0 and not BitBoard.placeValue( layout["sees"][r*n + c], values, masks,
+                                                                       r*n + c, board.board[r][c] ):
+                    consistent = False
+
+        # Variant boards have their own layout and are not cached
+        key = (board.p, board.q) if not board.isVariant() else None
+
+        path = []
+        if not consistent:
+            result = ((), None, False)
+        else:
+            while True:
+                if 0 not in values:
+                    result = ((), 0.0, True)
+                    break
+
+                state = (key, tuple( values ), tuple( masks )) if key != None else None
+                result = self.cache.get( state ) if state != None else None
+                if result != None:
+                    self.cache.move_to_end( state )
+                    self.numHits += 1
+                    break
+
+                name = self.step( layout, values, masks )
+                if name == None:
+                    result = ((("search", 1),), SEARCH_SCORE, False)
+                    break
+                if name == False:
+                    result = ((), None, False)
+                    break
+                path.append( (state, name) )
+
+        # Store the rest of the rating with every state on the way
+        techniques, score, solved = result
+        counts = dict( techniques )
+        for state, name in reversed( path ):
+            counts[name] = counts.get( name, 0 ) + 1
+            if score != None:
+                score = max( score, SCORES[name] )
+            if state != None:
+                self.store( state, (tuple( counts.items() ), score, solved) )
+
+        order = [name for name, s in TECHNIQUES] + ["search"]
+        return { "score"      : score,
+                 "techniques" : { name : counts[name] for name in order if name in counts },
+                 "solved"     : solved }
+
+    """
+        Applies the first technique that makes progress. Returns its name,
+        None if none does, or False on a contradiction.
+    """
+    def step ( self, layout, values, masks ):
+        for name, technique in self.techniques:
+            result = technique( layout, values, masks )
+            if result == None:
+                return False
+            if result:
+                return name
+        return None
+
+    def store ( self, state, result ):
+        self.cache[state] = result
+        self.cache.move_to_end( state )
+        if len( self.cache ) > self.cacheSize:
+            self.cache.popitem( last = False )
+
+    # ==================================================================
+    # Layout
+    # ==================================================================
+
+    """
+        Units, rows, cols and neighbors of board's network as cell indices,
+        shared by every board of the same p x q shape.
+    """
+    def layoutFor ( self, board ):
+        key = (board.p, board.q)
+        if not board.isVariant() and key in self.layouts:
+            return self.layouts[key]
+
+        n = board.N
+        network = ConstraintNetwork.ConstraintNetwork( board )
+        index = dict( (v, v.row*n + v.col) for v in network.getVariables() )
+
+        units = [[index[v] for v in c.vars] for c in network.units]
+        rows = [u for u in units if len( set( i // n for i in u ) ) == 1]
+        cols = [u for u in units if len( set( i % n for i in u ) ) == 1]
+        sees = [None] * (n*n)
+        for v in network.getVariables():
+            sees[index[v]] = frozenset( index[w] for w in network.getNeighborsOfVariable( v ) )
+
+        layout = { "n" : n, "units" : units, "rows" : rows, "cols" : cols, "sees" : sees,
+                   "overlaps" : BitBoard.unitOverlaps( units ) }
+        if not board.isVariant():
+            self.layouts[key] = layout
+        return layout
+
+    # ==================================================================
+    # Singles
+    # ==================================================================
+
+    def hiddenSingle ( self, layout, values, masks ):
+        full = (1 << layout["n"]) - 1
+        for u in layout["units"]:
+            once = BitBoard.hiddenValues( u, values, masks, full )
+            if once == None:
+                return None
+            if once:
+                bit = once & -once
+                for i in u:
+                    if not values[i] and masks[i] & bit:
+                        return self.place( layout, values, masks, i, bit.bit_length() )
+        return False
+
+    def nakedSingle ( self, layout, values, masks ):
+        for i in range( len( values ) ):
+            if not values[i]:
+                m = masks[i]
+                if not m & (m - 1):
+                    return self.place( layout, values, masks, i, m.bit_length() )
+        return False
+
+    # Places value in cell i, returns true or None on a contradiction
+    def place ( self, layout, values, masks, i, value ):
+        return True if BitBoard.placeValue( layout["sees"][i], values, masks, i, value ) else None
+
+    # ==================================================================
+    # Intersections
+    # ==================================================================
+
+    def lockedCandidates ( self, layout, values, masks ):
+        return BitBoard.lockedCandidates( layout["overlaps"], values, masks, once = True )
+
+    # ==================================================================
+    # Subsets
+    # ==================================================================
+
+    # k values of a unit that fit in only k cells own those cells
+    def hiddenSubset ( self, layout, values, masks, k ):
+        for u in layout["units"]:
+            where = dict()
+            for i in u:
+                if not values[i]:
+                    for value in BitBoard.maskValues( masks[i] ):
+                        where.setdefault( value, [] ).append( i )
+            candidates = [value for value in where if 2 <= len( where[value] ) <= k]
+            for subset in itertools.combinations( candidates, k ):
+                cells = set()
+                for value in subset:
+                    cells.update( where[value] )
+                if len( cells ) == k:
+                    keep = 0
+                    for value in subset:
+                        keep |= 1 << (value - 1)
+                    changed = False
+                    for i in cells:
+                        if masks[i] & ~keep:
+                            masks[i] &= keep
+                            changed = True
+                    if changed:
+                        return True
+        return False
+
+    def nakedPair ( self, layout, values, masks ):
+        return BitBoard.nakedSubsets( layout["units"], values, masks, 2, once = True )
+
+    def nakedTriple ( self, layout, values, masks ):
+        return BitBoard.nakedSubsets( layout["units"], values, masks, 3, once = True )
+
+    def nakedQuad ( self, layout, values, masks ):
+        return BitBoard.nakedSubsets( layout["units"], values, masks, 4, once = True )
+
+    def hiddenPair ( self, layout, values, masks ):
+        return self.hiddenSubset( layout, values, masks, 2 )
+
+    def hiddenTriple ( self, layout, values, masks ):
+        return self.hiddenSubset( layout, values, masks, 3 )
+
+    def hiddenQuad ( self, layout, values, masks ):
+        return self.hiddenSubset( layout, values, masks, 4 )
+
+    # ==================================================================
+    # Fish
+    # ==================================================================
+
+    """
+        If a value's candidates in k rows lie in only k columns, the value
+        goes nowhere else in those columns (and the same with rows and
+        columns swapped).
+    """
+    def fish ( self, layout, values, masks, k ):
+        n = layout["n"]
+        for bases, covers, line in ((layout["rows"], layout["cols"], lambda i: i % n),
+                                    (layout["cols"], layout["rows"], lambda i: i // n)):
+            if len( covers ) != n:
+                continue
+            coverOf = dict( (line( u[0] ), u) for u in covers )
+            for bit in [1 << v for v in range( n )]:
+                lines = []
+                for u in bases:
+                    where = frozenset( line( i ) for i in u if not values[i] and masks[i] & bit )
+                    if 2 <= len( where ) <= k:
+                        lines.append( (u, where) )
+                for subset in itertools.combinations( lines, k ):
+                    spanned = frozenset().union( *[where for u, where in subset] )
+                    if len( spanned ) != k:
+                        continue
+                    keep = set()
+                    for u, where in subset:
+                        keep.update( u )
+                    for c in spanned:
+                        result = BitBoard.eliminate( values, masks, coverOf[c], keep, bit )
+                        if result != False:
+                            return result
+        return False
+
+    def xWing ( self, layout, values, masks ):
+        return self.fish( layout, values, masks, 2 )
+
+    def swordfish ( self, layout, values, masks ):
+        return self.fish( layout, values, masks, 3 )
+
+    def jellyfish ( self, layout, values, masks ):
+        return self.fish( layout, values, masks, 4 )
+
+    # ==================================================================
+    # Wings and Chains
+    # ==================================================================
+
+    """
+        A pivot with candidates xy seeing pincers with xz and yz: one of
+        the pincers is z, so z goes in no cell that sees both.
+    """
+    def xyWing ( self, layout, values, masks ):
+        sees = layout["sees"]
+        for pivot in range( len( values ) ):
+            m = masks[pivot]
+            if values[pivot] or BitBoard.popcount( m ) != 2:
+                continue
+            pincers = [i for i in sees[pivot] if not values[i] and BitBoard.popcount( masks[i] ) == 2
+                       and BitBoard.popcount( masks[i] & m ) == 1]
+            for a, b in itertools.combinations( pincers, 2 ):
+                z = masks[a] & masks[b] & ~m
+                if z and (masks[a] | masks[b]) & m == m and masks[a] != masks[b]:
+                    result = BitBoard.eliminate( values, masks, sees[a] & sees[b], (pivot,), z )
+                    if result != False:
+                        return result
+        return False
+
+    """
+        Colors the cells of each value's conjugate pairs (units where the
+        value has exactly two places) in two alternating colors. A color
+        with two cells that see each other is false everywhere; a cell
+        seeing both colors of a cluster cannot hold the value.
+    """
+    def simpleColoring ( self, layout, values, masks ):
+        sees = layout["sees"]
+        for bit in [1 << v for v in range( layout["n"] )]:
+            links = dict()
+            for u in layout["units"]:
+                cells = [i for i in u if not values[i] and masks[i] & bit]
+                if len( cells ) == 2:
+                    links.setdefault( cells[0], set() ).add( cells[1] )
+                    links.setdefault( cells[1], set() ).add( cells[0] )
+
+            color = dict()
+            for start in links:
+                if start in color:
+                    continue
+                cluster = ([], [])
+                color[start] = 0
+                stack = [start]
+                while stack:
+                    i = stack.pop()
+                    cluster[color[i]].append( i )
+                    for j in links[i]:
+                        if j not in color:
+                            color[j] = 1 - color[i]
+                            stack.append( j )
+
+                for side in (0, 1):
+                    if any( b in sees[a] for a, b in itertools.combinations( cluster[side], 2 ) ):
+                        for i in cluster[side]:
+                            masks[i] &= ~bit
+                            if not masks[i]:
+                                return None
+                        return True
+
+                for i in range( len( values ) ):
+                    if not values[i] and masks[i] & bit and i not in color:
+                        if any( j in sees[i] for j in cluster[0] ) and any( j in sees[i] for j in cluster[1] ):
+                            masks[i] &= ~bit
+                            if not masks[i]:
+                                return None
+                            return True
+        return False
+
+    """
+        A chain of two-candidate cells, each seeing the next and sharing a
+        value with it: if the first cell is not z the last one is, so z
+        goes in no cell that sees both ends.
+    """
+    def xyChain ( self, layout, values, masks ):
+        sees = layout["sees"]
+        pairs = [i for i in range( len( values ) ) if not values[i] and BitBoard.popcount( masks[i] ) == 2]
+        for start in pairs:
+            for z in BitBoard.maskValues( masks[start] ):
+                zbit = 1 << (z - 1)
+
+                # Breadth-first over (cell, value the cell must then take)
+                frontier = [(start, masks[start] & ~zbit)]
+                visited = set( [start] )
+                for depth in range( MAX_CHAIN - 1 ):
+                    reached = []
+                    for i, forced in frontier:
+                        for j in sees[i]:
+                            if j in visited or values[j] or BitBoard.popcount( masks[j] ) != 2 or not masks[j] & forced:
+                                continue
+                            visited.add( j )
+                            other = masks[j] & ~forced
+                            if other == zbit and depth > 0:
+                                result = BitBoard.eliminate( values, masks, sees[start] & sees[j], (), zbit )
+                                if result != False:
+                                    return result
+                            reached.append( (j, other) )
+                    frontier = reached
+                    if not frontier:
+                        break
+        return False
+
+# ==================================================================
+# Bulk Rating
+# ==================================================================
+
+RATER = None
+
+def rateOne ( board ):
+    global RATER
+    if RATER == None:
+        RATER = DifficultyRater()
+    return RATER.rate( board )
+
+"""
+    Rates boards in order. With one process every rating shares one
+    rater and its state cache; with more, each worker process has its own.
+"""
+def rateMany ( boards, processes = 1 ):
+    if processes == 1:
+        return list( map( rateOne, boards ) )
+    with multiprocessing.Pool( processes ) as pool:
+        return pool.map( rateOne, boards, chunksize = max( 1, len( boards ) // 64 ) )
+
+def main ( ):
+    args = sys.argv
+    if len( args ) < 2:
+        print( "Usage: DifficultyRater.py directory [processes]" )
+        return
+
+    directory = args[1]
+    processes = int( args[2] ) if len( args ) > 2 else 1
+    names = sorted( os.listdir( directory ) )
+    boards = [SudokuBoard.SudokuBoard( filepath = os.path.join( directory, f ) ) for f in names]
+
+    for f, rating in zip( names, rateMany( boards, processes ) ):
+        score = "unsolvable" if rating["score"] == None else str(rating["score"])
+        used = " ".join( name + "x" + str(count) for name, count in rating["techniques"].items() )
+        print( f + " " + score + " " + used )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import time
+import socket
+import threading
+import subprocess
+
+"""
+    Load generator for SolverService. Replays the boards of a corpus
+    directory against a service, either one it starts itself on
+    stdin/stdout or one already listening on a Unix socket, keeping a fixed
+    number of requests in flight. Reports throughput and latency
+    percentiles measured from sending a request to reading its response.
+"""
+
+def percentile ( values, pct ):
+    if not values:
+        return 0.0
+    values = sorted( values )
+    k = min( len( values ) - 1, int( round( pct / 100.0 * (len( values ) - 1) ) ) )
+    return values[k]
+
+def loadBoards ( directory ):
+    boards = []
+    for f in sorted( os.listdir( directory ) ):
+        with open( os.path.join( directory, f ) ) as fp:
+            boards.append( fp.read() )
+    return boards
+
+"""
+    Sends count requests cycling over boards through the write/readline
+    pair and returns a dict of results.
+"""
+def run ( boards, count, concurrency, write, readline ):
+    slots = threading.Semaphore( concurrency )
+    sent = dict()
+    latencies = []
+    statuses = dict()
+
+    def reader ( ):
+        for i in range( count ):
+            line = readline()
+            if not line:
+                break
+            response = json.loads( line )
+            latencies.append( time.perf_counter() - sent.pop( response["id"] ) )
+            statuses[response["status"]] = statuses.get( response["status"], 0 ) + 1
+            slots.release()
+
+    thread = threading.Thread( target = reader )
+    start = time.perf_counter()
+    thread.start()
+
+    for i in range( count ):
+        slots.acquire()
+        sent[i] = time.perf_counter()
+        write( json.dumps( { "id" : i, "board" : boards[i % len( boards )] } ) + "\n" )
+
+    thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests"   : len( latencies ),
+        "seconds"    : elapsed,
+        "throughput" : len( latencies ) / elapsed if elapsed > 0 else 0.0,
+        "p50"        : percentile( latencies, 50 ),
+        "p90"        : percentile( latencies, 90 ),
+        "p99"        : percentile( latencies, 99 ),
+        "max"        : max( latencies ) if latencies else 0.0,
+        "statuses"   : statuses,
+    }
+
+def main ( ):
+    args = sys.argv[1:]
+    if not args:
+        print( "Usage: LoadGenerator.py directory [--count=n] [--concurrency=n] [--socket=path] [service options...]" )
+        return
+
+    directory = args[0]
+    count = 1000
+    concurrency = 32
+    socketPath = None
+    serviceArgs = []
+    for arg in args[1:]:
+        if arg.startswith( "--count=" ):
+            count = int( arg[len("--count="):] )
+        elif arg.startswith( "--concurrency=" ):
+            concurrency = int( arg[len("--concurrency="):] )
+        elif arg.startswith( "--socket=" ):
+            socketPath = arg[len("--socket="):]
+        else:
+            serviceArgs.append( arg )
+
+    boards = loadBoards( directory )
+
+    if socketPath != None:
+        sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        sock.connect( socketPath )
+        rfile = sock.makefile( "r" )
+        wfile = sock.makefile( "w" )
+
+        def write ( line ):
+            wfile.write( line )
+            wfile.flush()
+
+        results = run( boards, count, concurrency, write, rfile.readline )
+        sock.close()
+
+    else:
+        service = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "SolverService.py" )
+        proc = subprocess.Popen( [sys.executable, service] + serviceArgs,
+                                 stdin = subprocess.PIPE, stdout = subprocess.PIPE, text = True )
+
+        def write ( line ):
+            proc.stdin.write( line )
+            proc.stdin.flush()
+
+        results = run( boards, count, concurrency, write, proc.stdout.readline )
+        proc.stdin.close()
+        proc.wait()
+
+    print( json.dumps( results, indent = 2 ) )
+
+if __name__ == "__main__":
+    main()
@@ -2,46 +2,255 @@
 
 import sys
 import os
-import math
+from time import perf_counter
 import SudokuBoard
-import Constraint
-import ConstraintNetwork
 import BTSolver
 import Trail
-import time
+import SearchMonitor
 
 """
     Main driver file, which is responsible for interfacing with the
     command line and properly starting the backtrack solver.
+
+    Only the modules every run needs are imported up front; the optional
+    engines (caching, learning, profiling, parallel search, checkpoints,
+    preprocessing, result output, SAT, tracing) are imported when their
+    option is given.
+
+    SEED=n makes the random board of a run without a file reproducible,
+    and TRACE=path records the decisions of the search of a single board
+    to a file that SearchTrace.py replays.
 """
 
-def main ( ):
-    args = sys.argv
+# Command line tokens selecting the heuristics
+VAR_TOKENS = { "MRV" : "MinimumRemainingValue", "DEG" : "Degree", "MAD" : "MRVwithTieBreaker",
+               "WDEG" : "DomWeightedDegree" }
+VAL_TOKENS = { "LCV" : "LeastConstrainingValue" }
+CC_TOKENS  = { "FC" : "forwardChecking", "NOR" : "norvigCheck" }
+
+def printNogoodStats ( nogoods ):
+    if nogoods == None:
+        return
+
+    print( "Nogoods Learned: " + str(nogoods.getRecordedCount()) )
+    print( "Nogood Prunes: " + str(nogoods.getPruneCount()) )
+
+def printMemoryStats ( trail ):
+    print( "Peak Trail Size: " + str(trail.getPeakSize()) )
+    print( "Peak Trail Bytes: " + str(trail.getPeakBytes()) )
+
+# Writes the trace of the search, if one was recorded
+def saveTrace ( trace, filepath ):
+    if trace == None:
+        return
+    if trace.header == None:
+        print( "No search to trace" )
+        return
+    trace.save( filepath )
+    print( "Trace Events: " + str(len( trace.events )) )
+
+# Reads a byte count such as 500000, 64K, 512M or 2G
+def parseBytes ( text ):
+    units = { "K" : 1 << 10, "M" : 1 << 20, "G" : 1 << 30 }
+    if text[-1:].upper() in units:
+        return int( float( text[:-1] ) * units[text[-1:].upper()] )
+    return int( text )
+
+"""
+    Solves one board, consulting the solution cache first when there is one.
+    Returns the solution (or None) and the nogood store used, if any. The
+    engine options are keyword arguments; monitors are SearchMonitors
+    (profiler, trace) attached to the BTSolver search.
+"""
+def solveBoard ( sudokudata, trail, val_sh, var_sh, cc, *, learn = False, cache = None, monitors = (),
+                 parallel = False, checkpoint = None, preprocess = False, sat = False ):
+    original = sudokudata
+
+    # The cache and the preprocessor only know the row, col and block
+    # constraints
+    if sudokudata.isVariant():
+        cache = None
+        preprocess = False
+
+    # A pending checkpoint is resumed whatever board was given, so the
+    # cache, keyed by the given board, must not answer for it
+    if checkpoint != None and os.path.isfile( checkpoint ):
+        cache = None
+
+    if cache != None:
+        solution = cache.get( sudokudata )
+        if solution != None:
+            return solution, None
+
+    if preprocess:
+        import Preprocessor
+        pre = Preprocessor.Preprocessor( sudokudata )
+        if not pre.run():
+            return None, None
+        if pre.isSolved():
+            solution = pre.toSudokuBoard()
+            if cache != None:
+                cache.put( original, solution )
+            return solution, None
+
+        # Search from the board with every cell the pass filled in
+        sudokudata = pre.toSudokuBoard()
+
+    # Killer cages have no CNF encoding and stay with BTSolver
+    if sat and not sudokudata.cages:
+        import CnfEncoder
+        encoder = CnfEncoder.CnfEncoder( sudokudata )
+        solution = encoder.solve()
+
+        # The SAT engine's decisions and conflicts stand in for trail pushes and backtracks
+        Trail.Trail.numPush += encoder.solver.numDecisions
+        Trail.Trail.numUndo += encoder.solver.numConflicts
+
+        if solution != None and cache != None:
+            cache.put( original, solution )
+        return solution, None
+
+    if parallel:
+        import ParallelSolver
+        solver = ParallelSolver.ParallelSolver( val_sh, var_sh, cc )
+        solution = solver.solve( sudokudata )
+
+        # Fold the workers' counts into the shared trail statistics
+        Trail.Trail.numPush += solver.numPushes
+        Trail.Trail.numUndo += solver.numBacktracks
+
+        if solution != None and cache != None:
+            cache.put( original, solution )
+        return solution, None
+
+    nogoods = None
+    if learn:
+        import NogoodStore
+        nogoods = NogoodStore.NogoodStore()
+
+    if checkpoint != None:
+        import Checkpoint
+        pushes = trail.getPushCount()
+        backtracks = trail.getUndoCount()
+        solver, totalPushes, totalBacktracks = Checkpoint.solveWithCheckpoints( sudokudata, checkpoint, val_sh, var_sh, cc,
+                                                                                nogoods, trail = trail,
+                                                                                monitors = monitors )
+
+        # Count the work done by the runs before the last resume too
+        Trail.Trail.numPush += totalPushes - (trail.getPushCount() - pushes)
+        Trail.Trail.numUndo += totalBacktracks - (trail.getUndoCount() - backtracks)
+    else:
+        solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc, nogoods )
+        for monitor in monitors:
+            solver.addMonitor( monitor )
+        solver.solve()
+
+    if not solver.hassolution:
+        return None, solver.nogoods
+
+    solution = solver.getSolution()
+    if cache != None:
+        cache.put( original, solution )
+    return solution, solver.nogoods
+
+# Checks that solution fills board, agrees with its clues and keeps every constraint
+def isValidSolution ( board, solution ):
+    if not board.isVariant():
+        import BitBoard
+        return BitBoard.isValidSolution( board.p, board.q, solution.board, board.board )
+
+    import ConstraintNetwork
+    filled = SudokuBoard.SudokuBoard( board.p, board.q, board = solution.board )
+    filled.units = board.units
+    filled.regions = board.regions
+    filled.cages = board.cages
+    for r in range(board.N):
+        for c in range(board.N):
+            if solution.board[r][c] == 0 or board.board[r][c] not in (0, solution.board[r][c]):
+                return False
+    return ConstraintNetwork.ConstraintNetwork( filled ).isConsistent()
+
+def main ( argv = None ):
+    args = sys.argv[1:] if argv == None else argv
 
     # Important Variables
     file   = "";
     var_sh = "";
     val_sh = "";
     cc     = "";
+    learn  = False;
+    cache  = None;
+    profiler = None;
+    profile  = "";
+    parallel = False;
+    checkpoint = None;
+    preprocess = False;
+    output     = None;
+    verify     = False;
+    sat        = False;
+    dimacs     = None;
+    maxBytes   = None;
+    seed       = None;
+    trace      = None;
+    tracePath  = None;
+
+    for arg in args:
+        if arg in VAR_TOKENS:
+            var_sh = VAR_TOKENS[arg]
+
+        elif arg in VAL_TOKENS:
+            val_sh = VAL_TOKENS[arg]
+
+        elif arg in CC_TOKENS:
+            cc = CC_TOKENS[arg]
+
+        elif arg == "NOGOOD":
+            learn = True
+
+        elif arg == "CACHE":
+            import SolutionCache
+            cache = SolutionCache.SolutionCache()
+
+        elif arg.startswith( "CACHE=" ):
+            import SolutionCache
+            cache = SolutionCache.SolutionCache( filepath=arg[len("CACHE="):] )
+
+        elif arg.startswith( "PROFILE=" ):
+            import Profiler
+            profiler = Profiler.Profiler()
+            profile  = arg[len("PROFILE="):]
+
+        elif arg == "PARALLEL":
+            parallel = True
+
+        elif arg.startswith( "CHECKPOINT=" ):
+            checkpoint = arg[len("CHECKPOINT="):]
+
+        elif arg == "PRE":
+            preprocess = True
 
-    for arg in [args[i] for i in range(1, len(args))]:
-        if arg == "MRV":
-            var_sh = "MinimumRemainingValue"
+        elif arg.startswith( "OUT=" ):
+            output = arg[len("OUT="):]
 
-        elif arg == "DEG":
-            var_sh = "Degree"
+        elif arg == "VERIFY":
+            verify = True
 
-        elif arg == "MAD":
-            var_sh = "MRVwithTieBreaker"
+        elif arg == "SAT":
+            sat = True
 
-        elif arg == "LCV":
-            val_sh = "LeastConstrainingValue"
+        elif arg.startswith( "DIMACS=" ):
+            dimacs = arg[len("DIMACS="):]
 
-        elif arg == "FC":
-            cc = "forwardChecking"
+        elif arg.startswith( "MEMLIMIT=" ):
+            maxBytes = parseBytes( arg[len("MEMLIMIT="):] )
 
-        elif arg == "NOR":
-            cc = "norvigCheck"
+        elif arg.startswith( "SEED=" ):
+            seed = int( arg[len("SEED="):] )
+
+        elif arg.startswith( "TRACE=" ):
+            import SearchTrace
+            trace = SearchTrace.SearchTrace()
+            tracePath = arg[len("TRACE="):]
 
         elif arg == "TOURN":
             var_sh = "tournVar"
@@ -51,22 +260,46 @@ def main ( ):
         else:
             file = arg;
 
-    trail = Trail.Trail();
+    # The SAT and PARALLEL engines run no BTSolver search of their own
+    # to learn on, checkpoint or attach monitors to
+    if sat or parallel:
+        for option, given in (("CHECKPOINT", checkpoint != None), ("NOGOOD", learn),
+                              ("PROFILE", profiler != None), ("TRACE", trace != None)):
+            if given:
+                print( "[WARNING] " + option + " is not supported with SAT or PARALLEL and is ignored" )
+    if checkpoint != None and trace != None and os.path.isfile( checkpoint ):
+        print( "[WARNING] TRACE of a resumed search only covers this run and will not replay" )
+
+    trail = Trail.Trail( maxBytes );
+    options = { "learn" : learn, "cache" : cache, "parallel" : parallel, "preprocess" : preprocess, "sat" : sat,
+                "monitors" : [m for m in (profiler, trace) if m != None] }
 
     if file == "":
-        sudokudata = SudokuBoard.SudokuBoard( 3, 3, 7 )
+        sudokudata = SudokuBoard.SudokuBoard( 3, 3, 7, seed = seed )
         print(sudokudata)
 
-        solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-        solver.solve()
+        try:
+            solution, nogoods = solveBoard( sudokudata, trail, val_sh, var_sh, cc, **options )
+        except SearchMonitor.SearchAborted as e:
+            solution, nogoods = None, None
+            trail.clear()
+            print( "Search aborted: " + e.status )
 
-        if solver.hassolution:
-            print( solver.getSolution() )
+        if solution != None:
+            print( solution )
             print( "Trail Pushes: " + str(trail.getPushCount()) )
             print( "Backtracks: " + str(trail.getUndoCount()) )
+            printNogoodStats( nogoods )
 
         else:
             print( "Failed to find a solution" )
+        printMemoryStats( trail )
+
+        if cache != None:
+            cache.save()
+        if profiler != None:
+            profiler.write( profile )
+        saveTrace( trace, tracePath )
 
         return
 
@@ -74,40 +307,131 @@ def main ( ):
         listOfBoards = None
 
         try:
-            listOfBoards = os.listdir ( file )
+            listOfBoards = sorted( os.listdir ( file ) )
         except:
             print ( "[ERROR] Failed to open directory." )
             return
 
+        # TRACE records the search of a single board
+        options["monitors"] = [profiler] if profiler != None else []
+
+        writer = None
+        if output != None:
+            import ResultWriter
+            writer = ResultWriter.ResultWriter( output )
+
         numSolutions = 0
+        numInvalid   = 0
+        numLearned   = 0
+        numPrunes    = 0
+        numAborted   = 0
+        peakSize     = 0
+        peakBytes    = 0
         for f in listOfBoards:
             print ( "Running board: " + str(f) )
-            sudokudata = SudokuBoard.SudokuBoard( filepath=os.path.join( file, f ) )
+            try:
+                sudokudata = SudokuBoard.SudokuBoard( filepath=os.path.join( file, f ) )
+            except ValueError as e:
+                print ( "[ERROR] Invalid board: " + str(e) )
+                if writer != None:
+                    writer.write( f, "error" )
+                continue
 
-            solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-            solver.solve()
+            if writer != None:
+                pushes = trail.getPushCount()
+                backtracks = trail.getUndoCount()
+                start = perf_counter()
 
-            if solver.hassolution:
-                numSolutions += 1;
+            # Drop the previous board's entries so each peak is per solve
+            trail.clear()
+            trail.resetPeak()
+            status = "unsolved"
+            try:
+                solution, nogoods = solveBoard( sudokudata, trail, val_sh, var_sh, cc, **options )
+            except SearchMonitor.SearchAborted as e:
+                solution, nogoods = None, None
+                trail.clear()
+                status = "aborted"
+                numAborted += 1
+                print ( "Search aborted: " + e.status )
+
+            peakSize  = max( peakSize, trail.getPeakSize() )
+            peakBytes = max( peakBytes, trail.getPeakBytes() )
+            if solution != None:
+                status = "solved"
+                if verify and not isValidSolution( sudokudata, solution ):
+                    status = "invalid"
+                    numInvalid += 1
+                else:
+                    numSolutions += 1;
+
+            if writer != None:
+                writer.write( f, status, solution, { "seconds"    : round( perf_counter() - start, 6 ),
+                                                     "pushes"     : trail.getPushCount() - pushes,
+                                                     "backtracks" : trail.getUndoCount() - backtracks,
+                                                     "peakTrail"  : trail.getPeakSize(),
+                                                     "peakBytes"  : trail.getPeakBytes() } )
+
+            if nogoods != None:
+                numLearned += nogoods.getRecordedCount()
+                numPrunes  += nogoods.getPruneCount()
+
+        if writer != None:
+            writer.close()
 
         print ( "Solutions Found: " + str(numSolutions) )
+        if verify:
+            print ( "Invalid Solutions: " + str(numInvalid) )
         print ( "Trail Pushes: " + str(trail.getPushCount()) )
         print ( "Backtracks: "  + str(trail.getUndoCount()) )
+        print ( "Peak Trail Size: " + str(peakSize) )
+        print ( "Peak Trail Bytes: " + str(peakBytes) )
+        if maxBytes != None:
+            print ( "Aborted Searches: " + str(numAborted) )
+        if learn:
+            print ( "Nogoods Learned: " + str(numLearned) )
+            print ( "Nogood Prunes: " + str(numPrunes) )
+        if cache != None:
+            print ( "Cache Hits: " + str(cache.getHitCount()) )
+            cache.save()
+        if profiler != None:
+            profiler.write( profile )
 
         return
 
-    sudokudata =  SudokuBoard.SudokuBoard( filepath=os.path.abspath( file ) )
+    try:
+        sudokudata =  SudokuBoard.SudokuBoard( filepath=os.path.abspath( file ) )
+    except ValueError as e:
+        print( "[ERROR] Invalid board: " + str(e) )
+        return
     print(sudokudata)
 
-    solver = BTSolver.BTSolver( sudokudata, trail, val_sh, var_sh, cc )
-    solver.solve()
+    if dimacs != None:
+        import CnfEncoder
+        CnfEncoder.CnfEncoder( sudokudata ).writeDimacs( dimacs )
+
+    try:
+        solution, nogoods = solveBoard( sudokudata, trail, val_sh, var_sh, cc, checkpoint = checkpoint, **options )
+    except SearchMonitor.SearchAborted as e:
+        solution, nogoods = None, None
+        trail.clear()
+        print( "Search aborted: " + e.status )
 
-    if solver.hassolution:
-        print( solver.getSolution() )
+    if solution != None:
+        print( solution )
         print( "Trail Pushes: " + str(trail.getPushCount()) )
         print( "Backtracks: " + str(trail.getUndoCount()) )
+        printNogoodStats( nogoods )
 
     else:
         print( "Failed to find a solution" )
+    printMemoryStats( trail )
+
+    if cache != None:
+        cache.save()
+    if profiler != None:
+        profiler.write( profile )
+    saveTrace( trace, tracePath )
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+"""
+    Bounded store of nogoods learned while backtracking.
+
+    A nogood is a set of decisions, each a (row, col, value) literal, that
+    cannot all hold in any solution. Nogoods larger than maxSize are not
+    kept, and once the store holds maxNogoods entries the least recently
+    used one is evicted.
+"""
+
+class NogoodStore:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, maxNogoods = 10000, maxSize = 12 ):
+        self.maxNogoods = maxNogoods
+        self.maxSize = maxSize
+        self.nogoods = OrderedDict()
+        self.index = dict()
+
+        self.numRecorded = 0
+        self.numEvicted = 0
+        self.numPrunes = 0
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def size ( self ):
+        return len( self.nogoods )
+
+    def getRecordedCount ( self ):
+        return self.numRecorded
+
+    def getEvictedCount ( self ):
+        return self.numEvicted
+
+    def getPruneCount ( self ):
+        return self.numPrunes
+
+    """
+        Returns a stored nogood that contains literal and whose other
+        literals are all in assigned, or None if there is no such nogood.
+    """
+    def findViolated ( self, literal, assigned ):
+        for nogood in self.index.get( literal, () ):
+            if all( l == literal or l in assigned for l in nogood ):
+                self.nogoods.move_to_end( nogood )
+                self.numPrunes += 1
+                return nogood
+        return None
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    # Records a nogood, returns true if it was stored
+    def record ( self, literals ):
+        nogood = frozenset( literals )
+        if not nogood or len( nogood ) > self.maxSize:
+            return False
+
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end( nogood )
+            return False
+
+        self.nogoods[nogood] = True
+        for literal in nogood:
+            self.index.setdefault( literal, set() ).add( nogood )
+        self.numRecorded += 1
+
+        while len( self.nogoods ) > self.maxNogoods:
+            self.evict()
+        return True
+
+    # Removes the least recently used nogood
+    def evict ( self ):
+        nogood, _ = self.nogoods.popitem( last = False )
+        for literal in nogood:
+            bucket = self.index[literal]
+            bucket.discard( nogood )
+            if not bucket:
+                del self.index[literal]
+        self.numEvicted += 1
+
+    def clear ( self ):
+        self.nogoods = OrderedDict()
+        self.index = dict()
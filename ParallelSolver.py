@@ -0,0 +1,151 @@
+import multiprocessing
+import SudokuBoard
+import BTSolver
+import Trail
+
+"""
+    Solves a single board on several cores by splitting its search tree.
+
+    The top levels of the tree are expanded with the solver's own variable
+    and value heuristics until there are a few times more open subtrees than
+    workers. Each subtree is a prefix of (row, col, value) decisions; a
+    worker rebuilds the network, replays the prefix and searches below it.
+    The subtrees sit on the pool's shared task queue in search order, so a
+    worker that finishes early takes the next remaining one instead of
+    waiting on a fixed share. The pool is torn down as soon as a solution
+    comes back, and in counting mode the counts of all subtrees are summed.
+"""
+
+class ParallelSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, val_sh = "", var_sh = "", cc = "", processes = None, tasksPerProcess = 8 ):
+        self.valHeuristics = val_sh
+        self.varHeuristics = var_sh
+        self.cChecks = cc
+        self.processes = processes if processes != None else multiprocessing.cpu_count()
+        self.tasksPerProcess = tasksPerProcess
+
+        self.numTasks = 0
+        self.numPushes = 0
+        self.numBacktracks = 0
+
+    # ==================================================================
+    # Engine Functions
+    # ==================================================================
+
+    # Returns the solution as a SudokuBoard, or None
+    def solve ( self, board ):
+        tasks = self.makeTasks( board, False, None )
+        if not tasks:
+            return None
+
+        with multiprocessing.Pool( self.processes ) as pool:
+            for solution, pushes, backtracks in pool.imap_unordered( solveSubtree, tasks ):
+                self.numPushes += pushes
+                self.numBacktracks += backtracks
+                if solution != None:
+                    return SudokuBoard.SudokuBoard( board.p, board.q, board = solution )
+        return None
+
+    # Returns the number of solutions, or at least limit when one is given
+    def countSolutions ( self, board, limit = None ):
+        tasks = self.makeTasks( board, True, limit )
+        count = 0
+
+        with multiprocessing.Pool( self.processes ) as pool:
+            for found, pushes, backtracks in pool.imap_unordered( solveSubtree, tasks ):
+                self.numPushes += pushes
+                self.numBacktracks += backtracks
+                count += found
+                if limit != None and count >= limit:
+                    break
+        return count
+
+    # ==================================================================
+    # Splitting
+    # ==================================================================
+
+    def makeTasks ( self, board, counting, limit ):
+        config = (board.toFileString(), self.valHeuristics, self.varHeuristics, self.cChecks)
+        prefixes = self.split( board )
+        self.numTasks = len( prefixes )
+        return [(config, prefix, counting, limit) for prefix in prefixes]
+
+    """
+        Returns decision prefixes whose subtrees together cover the whole
+        search tree, breadth first until there are enough of them or no
+        prefix can be expanded further.
+    """
+    def split ( self, board ):
+        target = self.processes * self.tasksPerProcess
+        frontier = [[]]
+
+        while len( frontier ) < target:
+            expanded = []
+            grew = False
+            for prefix in frontier:
+                children = self.expand( board, prefix )
+                if children == None:
+                    expanded.append( prefix )
+                else:
+                    expanded.extend( children )
+                    grew = True
+            frontier = expanded
+            if not grew:
+                break
+        return frontier
+
+    # Returns the consistent one-decision extensions of prefix, or None
+    # when prefix already assigns every variable
+    def expand ( self, board, prefix ):
+        solver = BTSolver.BTSolver( board, Trail.Trail(), self.valHeuristics, self.varHeuristics, self.cChecks )
+        if not solver.replayAssignments( prefix ):
+            return []
+
+        v = solver.selectNextVariable()
+        if v == None:
+            return None
+
+        children = []
+        for i in solver.getNextValues( v ):
+            solver.trail.placeTrailMarker()
+            solver.trail.push( v )
+            v.assignValue( i )
+            if solver.checkConsistency():
+                children.append( prefix + [(v.row, v.col, i)] )
+            solver.trail.undo()
+        return children
+
+# ==================================================================
+# Worker
+# ==================================================================
+
+"""
+    Searches the subtree below a prefix. Returns (result, pushes,
+    backtracks) where result is the solution grid or None, or the number of
+    solutions in counting mode.
+"""
+def solveSubtree ( task ):
+    (text, val_sh, var_sh, cc), prefix, counting, limit = task
+
+    # Rebuilt from the input file format, with any variant constraints
+    board = SudokuBoard.SudokuBoard( text = text )
+    trail = Trail.Trail()
+    pushes = trail.getPushCount()
+    backtracks = trail.getUndoCount()
+
+    solver = BTSolver.BTSolver( board, trail, val_sh, var_sh, cc )
+    result = 0 if counting else None
+    if solver.replayAssignments( prefix ):
+        if counting:
+            result = solver.countSolutions( limit )
+        else:
+            solver.solve()
+            if solver.hassolution:
+                result = solver.getSolution().board
+
+    return result, trail.getPushCount() - pushes, trail.getUndoCount() - backtracks
@@ -0,0 +1,74 @@
+import BitBoard
+import SudokuBoard
+
+"""
+    Cheap logical pass run on the integer grid before any search state is
+    built. Naked and hidden singles, locked candidates (pointing and
+    claiming) and naked pairs, the BitBoard candidate primitives, are
+    applied on candidate bitmasks until none of them makes progress.
+    Boards it solves never reach BTSolver; the others are handed on with
+    every cell it could fill already filled.
+"""
+
+class Preprocessor:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, board ):
+        self.p = board.p
+        self.q = board.q
+        self.N = board.p*board.q
+        self.bits = BitBoard.BitBoard( board.p, board.q, board.board )
+        self.consistent = self.bits.consistent
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def isSolved ( self ):
+        return self.consistent and self.bits.isSolved()
+
+    def toSudokuBoard ( self ):
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = self.bits.toGrid() )
+
+    # ==================================================================
+    # Techniques
+    # ==================================================================
+
+    # Applies every technique to a fixpoint, returns false on a contradiction
+    def run ( self ):
+        values = self.bits.values
+        masks = self.bits.masks
+        while self.consistent:
+            if not self.bits.propagate( values, masks ):
+                self.consistent = False
+                break
+
+            changed = self.lockedCandidates( values, masks )
+            if changed == None:
+                self.consistent = False
+                break
+            pairs = self.nakedPairs( values, masks )
+            if pairs == None:
+                self.consistent = False
+                break
+            if not changed and not pairs:
+                break
+        return self.consistent
+
+    # Pointing and claiming over the overlapping units
+    def lockedCandidates ( self, values, masks ):
+        return BitBoard.lockedCandidates( self.bits.overlaps, values, masks )
+
+    # Two cells of a unit with the same two candidates own those values
+    def nakedPairs ( self, values, masks ):
+        return BitBoard.nakedSubsets( self.units(), values, masks, 2 )
+
+    # ==================================================================
+    # Helpers
+    # ==================================================================
+
+    def units ( self ):
+        return self.bits.units
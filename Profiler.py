@@ -0,0 +1,97 @@
+import json
+import SearchMonitor
+
+"""
+    SearchMonitor that collects per-phase timings and search counters, and
+    exports them as JSON or as folded stacks for flame graph tools
+    (flamegraph.pl, speedscope, ...).
+"""
+
+class Profiler ( SearchMonitor.SearchMonitor ):
+
+    wantsPhases = True
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self ):
+        self.phases = dict()
+        self.nodes = 0
+        self.assignments = 0
+        self.wipeouts = 0
+        self.backtracks = 0
+        self.solves = 0
+        self.seconds = 0.0
+
+    # ==================================================================
+    # Events
+    # ==================================================================
+
+    def onNode ( self, solver, v ):
+        self.nodes += 1
+
+    def onAssign ( self, solver, v, value ):
+        self.assignments += 1
+
+    def onWipeout ( self, solver, v ):
+        self.wipeouts += 1
+
+    def onBacktrack ( self, solver ):
+        self.backtracks += 1
+
+    def onPhase ( self, path, seconds ):
+        entry = self.phases.get( path )
+        if entry == None:
+            self.phases[path] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def onFinish ( self, solver, seconds ):
+        self.solves += 1
+        self.seconds += seconds
+
+    # ==================================================================
+    # Export
+    # ==================================================================
+
+    def toDict ( self ):
+        return {
+            "solves"      : self.solves,
+            "seconds"     : self.seconds,
+            "nodes"       : self.nodes,
+            "assignments" : self.assignments,
+            "wipeouts"    : self.wipeouts,
+            "backtracks"  : self.backtracks,
+            "phases"      : { ";".join( path ) : { "calls" : e[0], "seconds" : e[1] }
+                              for path, e in sorted( self.phases.items() ) },
+        }
+
+    def writeJSON ( self, filepath ):
+        with open( filepath, "w" ) as f:
+            json.dump( self.toDict(), f, indent = 2 )
+
+    """
+        Writes one "solve;phase;subphase microseconds" line per phase path,
+        weighted by the self time of the phase (its time minus the time of
+        the phases nested in it).
+    """
+    def writeFolded ( self, filepath ):
+        selfTimes = { path : e[1] for path, e in self.phases.items() }
+        for path, e in self.phases.items():
+            if len( path ) > 1 and path[:-1] in selfTimes:
+                selfTimes[path[:-1]] -= e[1]
+        rest = self.seconds - sum( e[1] for path, e in self.phases.items() if len( path ) == 1 )
+
+        with open( filepath, "w" ) as f:
+            f.write( "solve " + str( max( 0, int( rest * 1e6 ) ) ) + "\n" )
+            for path in sorted( selfTimes ):
+                f.write( "solve;" + ";".join( path ) + " " + str( max( 0, int( selfTimes[path] * 1e6 ) ) ) + "\n" )
+
+    # Writes JSON for .json paths and folded stacks otherwise
+    def write ( self, filepath ):
+        if filepath.endswith( ".json" ):
+            self.writeJSON( filepath )
+        else:
+            self.writeFolded( filepath )
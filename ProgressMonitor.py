@@ -0,0 +1,129 @@
+import time
+import queue
+import threading
+import SearchMonitor
+
+"""
+    Progress snapshots of a running BTSolver search.
+
+        for snapshot in ProgressMonitor.solveWithProgress( solver, 2.0 ):
+            print( snapshot["assigned"], snapshot["nodesPerSecond"] )
+            if stalled( snapshot ):
+                break
+
+    The search runs in a background thread and never waits on the consumer:
+    the monitor only looks at the clock on node expansion and, once per
+    interval, queues a snapshot. Leaving the loop early stops the search at
+    its next node expansion. The last snapshot has "status" set to
+    "solved" or "unsolvable" (and "solution" when solved), or "aborted"
+    with the SearchAborted status in "reason" when the search was stopped
+    some other way, e.g. by the trail's memory ceiling; progress snapshots
+    have status "running".
+"""
+
+class ProgressMonitor ( SearchMonitor.SearchMonitor ):
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, interval, out ):
+        self.interval = interval
+        self.out = out
+        self.stopped = False
+
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.nodes = 0
+        self.lastNodes = 0
+        self.backtracks = 0
+
+    # ==================================================================
+    # Events
+    # ==================================================================
+
+    def onNode ( self, solver, v ):
+        self.nodes += 1
+        if self.stopped:
+            raise SearchMonitor.SearchAborted( "stopped" )
+
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.out.put( self.snapshot( solver, now ) )
+            self.last = now
+            self.lastNodes = self.nodes
+
+    def onBacktrack ( self, solver ):
+        self.backtracks += 1
+
+    # ==================================================================
+    # Snapshots
+    # ==================================================================
+
+    def snapshot ( self, solver, now, status = "running" ):
+        window = now - self.last
+        assigned = 0
+        for v in solver.network.variables:
+            if v.isAssigned():
+                assigned += 1
+
+        return {
+            "status"         : status,
+            "elapsed"        : now - self.start,
+            "assigned"       : assigned,
+            "variables"      : len( solver.network.variables ),
+            "depth"          : len( solver.trail.trailMarker ),
+            "nodes"          : self.nodes,
+            "nodesPerSecond" : (self.nodes - self.lastNodes) / window if window > 0 else 0.0,
+            "backtracks"     : self.backtracks,
+            "board"          : solver.network.toSudokuBoard( solver.gameboard.p, solver.gameboard.q ),
+        }
+
+"""
+    Runs solver.solve() and yields a snapshot every interval seconds, then
+    a final snapshot when the search ends.
+"""
+def solveWithProgress ( solver, interval = 1.0 ):
+    out = queue.Queue()
+    monitor = ProgressMonitor( interval, out )
+    solver.addMonitor( monitor )
+    done = object()
+    errors = []
+    aborted = []
+
+    def run ( ):
+        try:
+            solver.solve()
+        except SearchMonitor.SearchAborted as e:
+            aborted.append( e.status )
+        except BaseException as e:
+            errors.append( e )
+        finally:
+            out.put( done )
+
+    thread = threading.Thread( target = run, daemon = True )
+    thread.start()
+    try:
+        while True:
+            item = out.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        monitor.stopped = True
+        thread.join()
+        solver.removeMonitor( monitor )
+
+    if errors:
+        raise errors[0]
+
+    if aborted:
+        final = monitor.snapshot( solver, time.perf_counter(), "aborted" )
+        final["reason"] = aborted[0]
+        yield final
+        return
+
+    final = monitor.snapshot( solver, time.perf_counter(), "solved" if solver.hassolution else "unsolvable" )
+    if solver.hassolution:
+        final["solution"] = solver.getSolution()
+    yield final
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import random
+import multiprocessing
+import BitBoard
+import SudokuBoard
+import BTSolver
+import Trail
+
+"""
+    Generates puzzles with a unique solution for benchmark and test corpora.
+
+    A full grid is built by a randomized bitmask search, then clues are
+    removed in random order as long as the puzzle keeps a single solution.
+    Difficulty is the number of backtracks BTSolver needs (MRV + forward
+    checking by default); when a range is requested the number of removed
+    clues is binary searched for a puzzle whose difficulty falls inside it.
+
+    Every puzzle is derived from its own seed, so a run is reproducible and
+    gives the same corpus however many processes it is spread across.
+"""
+
+class PuzzleGenerator:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, p = 3, q = 3, seed = None ):
+        self.p = p
+        self.q = q
+        self.N = p*q
+        self.rng = random.Random( seed )
+
+        self.varHeuristic = "MinimumRemainingValue"
+        self.valHeuristic = ""
+        self.consistencyCheck = "forwardChecking"
+
+    # ==================================================================
+    # Generation
+    # ==================================================================
+
+    # Returns a random full valid grid
+    def fullGrid ( self ):
+        return BitBoard.BitBoard( self.p, self.q ).findSolution( self.rng )
+
+    """
+        Removes clues from grid in random order, keeping every removal that
+        leaves the solution unique. Returns the resulting minimal puzzle and
+        the removed cells in the order they were removed.
+    """
+    def dig ( self, grid, minClues = 0 ):
+        puzzle = [row[:] for row in grid]
+        cells = list( range( self.N*self.N ) )
+        self.rng.shuffle( cells )
+
+        removed = []
+        clues = self.N*self.N
+        for i in cells:
+            if clues <= minClues:
+                break
+            r, c = divmod( i, self.N )
+            value = puzzle[r][c]
+            puzzle[r][c] = 0
+            if BitBoard.BitBoard( self.p, self.q, puzzle ).countSolutions( 2 ) == 1:
+                removed.append( i )
+                clues -= 1
+            else:
+                puzzle[r][c] = value
+        return puzzle, removed
+
+    # Returns the number of backtracks BTSolver needs on board
+    def rate ( self, board ):
+        trail = Trail.Trail()
+        before = trail.getUndoCount()
+        solver = BTSolver.BTSolver( board, trail, self.valHeuristic, self.varHeuristic, self.consistencyCheck )
+        solver.solve()
+        return trail.getUndoCount() - before
+
+    """
+        Returns a SudokuBoard with a unique solution, or None if no puzzle in
+        [minDifficulty, maxDifficulty] was found within attempts full grids.
+        Without a difficulty range the minimal puzzle of the first grid is
+        returned.
+    """
+    def generate ( self, minDifficulty = None, maxDifficulty = None, minClues = 0, attempts = 20 ):
+        for attempt in range( attempts ):
+            grid = self.fullGrid()
+            puzzle, removed = self.dig( grid, minClues )
+            if minDifficulty == None and maxDifficulty == None:
+                return SudokuBoard.SudokuBoard( self.p, self.q, board = puzzle )
+
+            low = minDifficulty if minDifficulty != None else 0
+            hardest = self.build( grid, removed, len( removed ) )
+            difficulty = self.rate( hardest )
+            if difficulty < low:
+                continue
+            if maxDifficulty == None or difficulty <= maxDifficulty:
+                return hardest
+
+            # Fewest removals that reach the lower bound
+            lo = 0
+            hi = len( removed )
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.rate( self.build( grid, removed, mid ) ) >= low:
+                    hi = mid
+                else:
+                    lo = mid + 1
+
+            board = self.build( grid, removed, lo )
+            if self.rate( board ) <= maxDifficulty:
+                return board
+        return None
+
+    # Returns grid with the first k removed cells emptied
+    def build ( self, grid, removed, k ):
+        puzzle = [row[:] for row in grid]
+        for i in removed[:k]:
+            r, c = divmod( i, self.N )
+            puzzle[r][c] = 0
+        return SudokuBoard.SudokuBoard( self.p, self.q, board = puzzle )
+
+# ==================================================================
+# Batch Generation
+# ==================================================================
+
+def generateOne ( task ):
+    p, q, seed, minDifficulty, maxDifficulty = task
+    return PuzzleGenerator( p, q, seed ).generate( minDifficulty, maxDifficulty )
+
+"""
+    Generates count puzzles, spread over processes worker processes (all
+    cores when None). Puzzles that missed the difficulty range are left out.
+"""
+def generateMany ( count, p = 3, q = 3, seed = None, minDifficulty = None, maxDifficulty = None, processes = None ):
+    rng = random.Random( seed )
+    tasks = [(p, q, rng.getrandbits( 64 ), minDifficulty, maxDifficulty) for i in range( count )]
+
+    if processes == 1:
+        boards = list( map( generateOne, tasks ) )
+    else:
+        with multiprocessing.Pool( processes ) as pool:
+            boards = pool.map( generateOne, tasks, chunksize = max( 1, count // 64 ) )
+    return [b for b in boards if b != None]
+
+# Writes boards to directory, one file per board
+def writeCorpus ( boards, directory ):
+    os.makedirs( directory, exist_ok = True )
+    for i, board in enumerate( boards ):
+        with open( os.path.join( directory, "puzzle_" + str(i).zfill(5) + ".txt" ), "w" ) as f:
+            f.write( board.toFileString() )
+
+def main ( ):
+    args = sys.argv
+    if len( args ) < 5:
+        print( "Usage: PuzzleGenerator.py p q count directory [seed] [minBacktracks] [maxBacktracks]" )
+        return
+
+    p = int( args[1] )
+    q = int( args[2] )
+    count = int( args[3] )
+    seed = int( args[5] ) if len( args ) > 5 else None
+    minDifficulty = int( args[6] ) if len( args ) > 6 else None
+    maxDifficulty = int( args[7] ) if len( args ) > 7 else None
+
+    boards = generateMany( count, p, q, seed, minDifficulty, maxDifficulty )
+    writeCorpus( boards, args[4] )
+    print( "Puzzles Written: " + str(len(boards)) )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import time
+import SudokuBoard
+import Trail
+import Main
+
+"""
+    Regression check of every solver configuration Main.py offers against
+    the bundled corpus, RegressionCorpus.jsonl.
+
+    The corpus holds boards of several p x q shapes and variants, one JSON
+    record per line: a name, the board in the input file format and what
+    is expected of it, "unique" (with the solution), "multiple" or "unsat".
+    Every combination of variable heuristic, value heuristic and
+    consistency check, with and without NOGOOD, plus TOURN and the PRE,
+    SAT, CACHE and PARALLEL engines, solves every board. A unique board
+    must come back with its solution, a multiple one with any valid
+    solution agreeing with the givens, and an unsat one with none.
+
+    To keep the run short, configurations without propagation only get
+    boards of up to WEAK_LIMIT values per unit, where plain backtracking
+    is quick, and boards larger than 9x9 only go to one configuration of
+    each engine.
+
+        RegressionCheck.py [corpus]
+
+    Exits with status 1 if any check fails.
+"""
+
+CORPUS = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "RegressionCorpus.jsonl" )
+
+WEAK_LIMIT = 4
+LIMIT = 9
+
+def loadCorpus ( filepath ):
+    with open( filepath ) as f:
+        return [json.loads( line ) for line in f if line.strip()]
+
+# Every token combination to check, with the largest N it gets boards of
+def configurations ( ):
+    configs = []
+    for var in [""] + list( Main.VAR_TOKENS ):
+        for val in [""] + list( Main.VAL_TOKENS ):
+            for cc in [""] + list( Main.CC_TOKENS ):
+                tokens = [t for t in (var, val, cc) if t != ""]
+                limit = WEAK_LIMIT if cc == "" else LIMIT
+                configs.append( (tokens, limit) )
+                configs.append( (tokens + ["NOGOOD"], limit) )
+    configs.append( (["MRV", "FC"], None) )
+    configs.append( (["WDEG", "NOR", "NOGOOD"], None) )
+    configs.append( (["TOURN"], None) )
+    configs.append( (["MRV", "FC", "PRE"], None) )
+    configs.append( (["SAT"], None) )
+    configs.append( (["MRV", "FC", "CACHE"], LIMIT) )
+    configs.append( (["MRV", "FC", "PARALLEL"], LIMIT) )
+    return configs
+
+# Returns the heuristics and the solveBoard options of a token list
+def settings ( tokens ):
+    heuristics = { "var" : "", "val" : "", "cc" : "" }
+    options = { "learn" : False, "cache" : None, "parallel" : False, "preprocess" : False, "sat" : False }
+    for t in tokens:
+        if t in Main.VAR_TOKENS:
+            heuristics["var"] = Main.VAR_TOKENS[t]
+        elif t in Main.VAL_TOKENS:
+            heuristics["val"] = Main.VAL_TOKENS[t]
+        elif t in Main.CC_TOKENS:
+            heuristics["cc"] = Main.CC_TOKENS[t]
+        elif t == "TOURN":
+            heuristics.update( var = "tournVar", val = "tournVal", cc = "tournCC" )
+        elif t == "NOGOOD":
+            options["learn"] = True
+        elif t == "CACHE":
+            import SolutionCache
+            options["cache"] = SolutionCache.SolutionCache()
+        elif t == "PARALLEL":
+            options["parallel"] = True
+        elif t == "PRE":
+            options["preprocess"] = True
+        elif t == "SAT":
+            options["sat"] = True
+    return heuristics, options
+
+# Returns None if the solution meets the record's expectation, else what is wrong
+def checkSolution ( record, board, solution ):
+    expect = record["expect"]
+    if expect == "unsat":
+        return None if solution == None else "found a solution to an unsolvable board"
+    if solution == None:
+        return "no solution found"
+    if not Main.isValidSolution( board, solution ):
+        return "invalid solution"
+    if expect == "unique" and solution.board != record["solution"]:
+        return "solution differs from the known one"
+    return None
+
+def checkOne ( record, tokens ):
+    heuristics, options = settings( tokens )
+    runs = 2 if options["cache"] != None else 1
+    for run in range( runs ):
+        board = SudokuBoard.SudokuBoard( text = record["board"] )
+        solution, nogoods = Main.solveBoard( board, Trail.Trail(), heuristics["val"], heuristics["var"], heuristics["cc"],
+                                             **options )
+        problem = checkSolution( record, board, solution )
+        if problem != None:
+            return problem
+    return None
+
+def main ( ):
+    corpus = loadCorpus( sys.argv[1] if len( sys.argv ) > 1 else CORPUS )
+    start = time.perf_counter()
+    checks = 0
+    failures = 0
+
+    sizes = [SudokuBoard.SudokuBoard( text = record["board"] ).N for record in corpus]
+    for tokens, limit in configurations( ):
+        for record, n in zip( corpus, sizes ):
+            if limit != None and n > limit:
+                continue
+
+            checks += 1
+            try:
+                problem = checkOne( record, tokens )
+            except Exception as e:
+                problem = "raised " + repr( e )
+            if problem != None:
+                failures += 1
+                print( "[FAIL] " + record["name"] + " " + " ".join( tokens ) + ": " + problem )
+
+    print( "Checks: " + str(checks) )
+    print( "Failures: " + str(failures) )
+    print( "Time: %.1f s" % (time.perf_counter() - start) )
+    if failures:
+        sys.exit( 1 )
+    print( "[OK]" )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import io
+import csv
+import json
+
+"""
+    Streams one record per solved board to a JSON-lines or CSV file.
+
+    A record holds the input id, the status, the solution as a string
+    (row-major cell values in the board's odometer digits, space separated
+    on boards with values past Z) and the solve statistics. Records are
+    formatted into an in-memory buffer and written to the file in bulk
+    every bufferSize records.
+"""
+
+FIELDS = [ "id", "status", "solution", "seconds", "pushes", "backtracks", "peakTrail", "peakBytes" ]
+
+class ResultWriter:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, filepath, format = None, bufferSize = 256 ):
+        if format == None:
+            format = "csv" if filepath.endswith( ".csv" ) else "jsonl"
+        if format not in ( "csv", "jsonl" ):
+            raise ValueError( "unknown result format: " + str(format) )
+
+        self.format = format
+        self.bufferSize = bufferSize
+        self.file = open( filepath, "w", newline = "" )
+        self.buffer = io.StringIO()
+        self.pending = 0
+        self.numRecords = 0
+
+        if format == "csv":
+            self.csv = csv.DictWriter( self.buffer, fieldnames = FIELDS, extrasaction = "ignore" )
+            self.csv.writeheader()
+
+    # ==================================================================
+    # Writing
+    # ==================================================================
+
+    """
+        Adds the record of one board. solution is a SudokuBoard or None,
+        stats a dict with any of seconds, pushes, backtracks, peakTrail
+        and peakBytes.
+    """
+    def write ( self, id, status, solution = None, stats = None ):
+        record = { "id" : id, "status" : status,
+                   "solution" : self.solutionString( solution ) if solution != None else "" }
+        if stats != None:
+            record.update( stats )
+
+        if self.format == "csv":
+            self.csv.writerow( record )
+        else:
+            self.buffer.write( json.dumps( record ) )
+            self.buffer.write( "\n" )
+
+        self.numRecords += 1
+        self.pending += 1
+        if self.pending >= self.bufferSize:
+            self.flush()
+
+    def flush ( self ):
+        self.file.write( self.buffer.getvalue() )
+        self.file.flush()
+        self.buffer.seek( 0 )
+        self.buffer.truncate()
+        self.pending = 0
+
+    def close ( self ):
+        self.flush()
+        self.file.close()
+
+    def __enter__ ( self ):
+        return self
+
+    def __exit__ ( self, *exc ):
+        self.close()
+
+    # ==================================================================
+    # Helpers
+    # ==================================================================
+
+    def solutionString ( self, solution ):
+        n = solution.p*solution.q
+        delim = " " if n >= 36 else ""
+        return delim.join( solution.intToOdometer( v ) for row in solution.board for v in row )
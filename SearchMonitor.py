@@ -0,0 +1,46 @@
+"""
+    Observer of a BTSolver search. Subclass it, override the events of
+    interest and attach it with BTSolver.addMonitor.
+
+    Phases are reported as a tuple path of the instrumented calls that were
+    running, e.g. ("checkConsistency", "trail.push"), with the inclusive
+    time spent in the innermost one. Phases are only timed when one of the
+    attached monitors sets wantsPhases.
+
+    A monitor may stop the search by raising SearchAborted from an event;
+    it propagates out of BTSolver.solve with the network left mid-search.
+"""
+
+class SearchAborted ( Exception ):
+
+    def __init__ ( self, status ):
+        Exception.__init__( self, status )
+        self.status = status
+
+class SearchMonitor:
+
+    wantsPhases = False
+
+    # Called once per node expansion with the selected variable (None when
+    # the assignment is complete)
+    def onNode ( self, solver, v ):
+        pass
+
+    # Called when v has been assigned value, before propagation
+    def onAssign ( self, solver, v, value ):
+        pass
+
+    # Called when propagation after assigning v failed
+    def onWipeout ( self, solver, v ):
+        pass
+
+    # Called after the trail has been undone back to the last marker
+    def onBacktrack ( self, solver ):
+        pass
+
+    def onPhase ( self, path, seconds ):
+        pass
+
+    # Called when the outermost solve returns
+    def onFinish ( self, solver, seconds ):
+        pass
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import zlib
+import array
+import SudokuBoard
+import BTSolver
+import Trail
+import SearchMonitor
+
+"""
+    Records the decision trace of a BTSolver search and replays it to check
+    that another run explores exactly the same tree.
+
+    The trace is the sequence of search events: every node expansion with
+    the selected cell, every assignment with its value, and the outcome of
+    each assignment, a wipeout or the next node below it, plus every
+    backtrack. Each event is packed into one integer, see encode. A trace
+    file is a JSON header line (the board searched, the heuristics, the
+    event count and the recorded time) followed by the zlib compressed
+    events.
+
+        SearchTrace.py trace
+
+    solves the header's board again with the same heuristics, compares the
+    events as they happen, stops at the first difference and reports both
+    times. It exits with status 1 if the trees differ.
+"""
+
+NODE      = 0
+ASSIGN    = 1
+WIPEOUT   = 2
+BACKTRACK = 3
+
+KIND_NAMES = ( "node", "assign", "wipeout", "backtrack" )
+
+class SearchTrace ( SearchMonitor.SearchMonitor ):
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    """
+        With expected (the events of a loaded trace) every event is checked
+        against the recorded one and the search is aborted with status
+        "diverged" at the first difference.
+    """
+    def __init__ ( self, expected = None ):
+        self.events = array.array( "q" )
+        self.expected = expected
+        self.divergence = None
+        self.header = None
+        self.seconds = None
+
+    # ==================================================================
+    # Events
+    # ==================================================================
+
+    """
+        Packs an event: the kind in the low two bits, above them the cell
+        index (row-major, -1 for none) and the value.
+    """
+    def encode ( self, solver, kind, v = None, value = 0 ):
+        n = solver.gameboard.N
+        cell = v.row*n + v.col if v != None else -1
+        return ((cell + 1) * (n + 1) + value) << 2 | kind
+
+    def add ( self, event ):
+        if self.expected != None:
+            i = len( self.events )
+            if i >= len( self.expected ) or self.expected[i] != event:
+                self.divergence = i
+                self.events.append( event )
+                raise SearchMonitor.SearchAborted( "diverged" )
+        self.events.append( event )
+
+    def onNode ( self, solver, v ):
+        self.add( self.encode( solver, NODE, v ) )
+
+    def onAssign ( self, solver, v, value ):
+        self.add( self.encode( solver, ASSIGN, v, value ) )
+
+    def onWipeout ( self, solver, v ):
+        self.add( self.encode( solver, WIPEOUT, v ) )
+
+    def onBacktrack ( self, solver ):
+        self.add( self.encode( solver, BACKTRACK ) )
+
+    def onFinish ( self, solver, seconds ):
+        self.seconds = seconds
+        self.header = {
+            "board"   : solver.gameboard.toFileString(),
+            "var"     : solver.varHeuristics,
+            "val"     : solver.valHeuristics,
+            "cc"      : solver.cChecks,
+            "learn"   : solver.nogoods != None,
+            "events"  : len( self.events ),
+            "seconds" : round( seconds, 6 ),
+        }
+        if self.expected != None and self.divergence == None and len( self.events ) != len( self.expected ):
+            self.divergence = len( self.events )
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # True once the search has finished without leaving the expected trace
+    def matches ( self ):
+        return self.header != None and self.divergence == None
+
+    # Describes an event of a board with N values per unit
+    def describe ( self, event, n ):
+        kind = event & 3
+        event >>= 2
+        cell = event // (n + 1) - 1
+        value = event % (n + 1)
+        text = KIND_NAMES[kind]
+        if cell >= 0:
+            text += " (" + str(cell // n) + "," + str(cell % n) + ")"
+        if kind == ASSIGN:
+            text += "=" + str(value)
+        return text
+
+    # ==================================================================
+    # Files
+    # ==================================================================
+
+    # Writes the trace of a finished search
+    def save ( self, filepath ):
+        events = self.events
+        if sys.byteorder != "little":
+            events = array.array( "q", events )
+            events.byteswap()
+        with open( filepath, "wb" ) as f:
+            f.write( json.dumps( self.header ).encode() + b"\n" )
+            f.write( zlib.compress( events.tobytes() ) )
+
+# Reads a trace file, returns its header and events
+def load ( filepath ):
+    with open( filepath, "rb" ) as f:
+        header = json.loads( f.readline() )
+        events = array.array( "q" )
+        events.frombytes( zlib.decompress( f.read() ) )
+    if sys.byteorder != "little":
+        events.byteswap()
+    return header, events
+
+"""
+    Searches the board of a trace file again with its heuristics and
+    returns the replaying SearchTrace, whose matches() tells if the same
+    tree was explored.
+"""
+def replay ( filepath ):
+    header, events = load( filepath )
+    board = SudokuBoard.SudokuBoard( text = header["board"] )
+
+    nogoods = None
+    if header["learn"]:
+        import NogoodStore
+        nogoods = NogoodStore.NogoodStore()
+
+    solver = BTSolver.BTSolver( board, Trail.Trail(), header["val"], header["var"], header["cc"], nogoods )
+    trace = SearchTrace( events )
+    solver.addMonitor( trace )
+    try:
+        solver.solve()
+    except SearchMonitor.SearchAborted:
+        pass
+    return trace
+
+def main ( ):
+    if len( sys.argv ) < 2:
+        print( "Usage: SearchTrace.py trace" )
+        return
+
+    header, events = load( sys.argv[1] )
+    trace = replay( sys.argv[1] )
+    n = SudokuBoard.SudokuBoard( text = header["board"] ).N
+
+    print( "Events: " + str(len( events )) )
+    print( "Recorded: %.3f s" % header["seconds"] )
+    if trace.matches():
+        print( "Replayed: %.3f s" % trace.seconds )
+        print( "Same tree" )
+        return
+
+    i = trace.divergence
+    expected = trace.describe( events[i], n ) if i < len( events ) else "end of search"
+    found = trace.describe( trace.events[i], n ) if i < len( trace.events ) else "end of search"
+    print( "Diverged at event " + str(i) + ": expected " + expected + ", found " + found )
+    sys.exit( 1 )
+
+if __name__ == "__main__":
+    main()
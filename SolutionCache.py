@@ -0,0 +1,226 @@
+import json
+import os
+from collections import OrderedDict
+import SudokuBoard
+
+"""
+    LRU cache of solved boards keyed by a canonical form of the puzzle.
+
+    Boards that are equal up to the Sudoku symmetries of their p x q shape
+    (band and stack permutations, row and column permutations inside them,
+    digit relabeling and, for square blocks, transposition) share one
+    entry. A cached solution is stored in canonical coordinates and mapped
+    back through the inverse transform of the board being looked up.
+
+    Rows and columns are ordered by signatures that do not change under the
+    symmetry group, with ties kept in board order, so two equivalent boards
+    whose signatures tie may still get different keys. That only costs a
+    cache miss: every key maps back exactly to its own board.
+
+    Canonicalizing costs far more than a dict lookup, so boards seen
+    before exactly as they are also have an entry keyed by the grid itself,
+    which get consults first.
+"""
+
+class SolutionCache:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, maxSize = 4096, filepath = None ):
+        self.maxSize = maxSize
+        self.filepath = filepath
+        self.entries = OrderedDict()
+
+        # Exact board -> solution grid, for repeats of the same board
+        self.exact = OrderedDict()
+
+        self.numHits = 0
+        self.numMisses = 0
+
+        if filepath != None and os.path.isfile( filepath ):
+            self.load()
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    def size ( self ):
+        return len( self.entries )
+
+    def getHitCount ( self ):
+        return self.numHits
+
+    def getMissCount ( self ):
+        return self.numMisses
+
+    # Returns the cached solution of board as a SudokuBoard, or None
+    def get ( self, board ):
+        exactKey = self.exactKey( board )
+        grid = self.exact.get( exactKey )
+        if grid != None:
+            self.exact.move_to_end( exactKey )
+            self.numHits += 1
+            return SudokuBoard.SudokuBoard( board.p, board.q, board = [list( row ) for row in grid] )
+
+        key, transform = self.canonicalize( board )
+        solution = self.entries.get( key )
+        if solution == None:
+            self.numMisses += 1
+            return None
+
+        self.entries.move_to_end( key )
+        self.numHits += 1
+        grid = self.fromCanonical( solution, board.p*board.q, transform )
+        self.putExact( exactKey, grid )
+        return SudokuBoard.SudokuBoard( board.p, board.q, board = grid )
+
+    def exactKey ( self, board ):
+        return (board.p, board.q, tuple( map( tuple, board.board ) ))
+
+    # ==================================================================
+    # Modifiers
+    # ==================================================================
+
+    def put ( self, board, solution ):
+        key, transform = self.canonicalize( board )
+        self.entries[key] = self.toCanonical( solution.board, transform )
+        self.entries.move_to_end( key )
+        self.putExact( self.exactKey( board ), solution.board )
+
+        while len( self.entries ) > self.maxSize:
+            self.entries.popitem( last = False )
+
+    def putExact ( self, exactKey, grid ):
+        self.exact[exactKey] = tuple( map( tuple, grid ) )
+        self.exact.move_to_end( exactKey )
+        while len( self.exact ) > self.maxSize:
+            self.exact.popitem( last = False )
+
+    def clear ( self ):
+        self.entries = OrderedDict()
+        self.exact = OrderedDict()
+
+    # ==================================================================
+    # Persistence
+    # ==================================================================
+
+    def load ( self ):
+        with open( self.filepath ) as f:
+            data = json.load( f )
+        for key, solution in data:
+            self.entries[key] = solution
+        while len( self.entries ) > self.maxSize:
+            self.entries.popitem( last = False )
+
+    # Writes the cache to its file, least recently used entries first
+    def save ( self ):
+        if self.filepath == None:
+            return
+        tmp = self.filepath + ".tmp"
+        with open( tmp, "w" ) as f:
+            json.dump( list( self.entries.items() ), f )
+        os.replace( tmp, self.filepath )
+
+    # ==================================================================
+    # Canonical Form
+    # ==================================================================
+
+    """
+        Returns (key, transform) for board. The transform is a tuple
+        (transposed, rows, cols, labels): canonical cell (r, c) holds the
+        original cell (rows[r], cols[c]) of the (possibly transposed) grid,
+        and labels maps original digits to canonical digits.
+    """
+    def canonicalize ( self, board ):
+        p, q, n = board.p, board.q, board.p*board.q
+        grid = board.board
+
+        best = None
+        orientations = [False, True] if p == q else [False]
+        for transposed in orientations:
+            g = [list( r ) for r in zip( *grid )] if transposed else grid
+            rowSigs, colSigs = self.signatures( g, n )
+            rows = self.orderLines( rowSigs, p, q )
+            cols = self.orderLines( colSigs, q, p )
+
+            labels = dict()
+            cells = []
+            for r in rows:
+                line = g[r]
+                for c in cols:
+                    value = line[c]
+                    if value != 0 and value not in labels:
+                        labels[value] = len( labels ) + 1
+                    cells.append( labels.get( value, 0 ) )
+
+            for value in range( 1, n+1 ):
+                if value not in labels:
+                    labels[value] = len( labels ) + 1
+
+            if best == None or cells < best[0]:
+                best = (cells, (transposed, rows, cols, labels))
+
+        cells, transform = best
+        key = str(p) + "x" + str(q) + ":" + ",".join( map( str, cells ) )
+        return key, transform
+
+    """
+        Returns invariant signatures for the rows and the columns of g.
+        They start from clue counts and are refined a few times: a row's
+        signature gathers the signatures of the columns its clues sit in
+        together with how often each clue's digit occurs, and the other way
+        round for columns.
+    """
+    def signatures ( self, g, n ):
+        digitCounts = dict()
+        for line in g:
+            for value in line:
+                digitCounts[value] = digitCounts.get( value, 0 ) + 1
+
+        rowSigs = [0] * n
+        colSigs = [0] * n
+        for round in range( 3 ):
+            rows = [tuple( sorted( (colSigs[j], digitCounts[g[i][j]]) for j in range( n ) if g[i][j] != 0 ) )
+                    for i in range( n )]
+            cols = [tuple( sorted( (rowSigs[i], digitCounts[g[i][j]]) for i in range( n ) if g[i][j] != 0 ) )
+                    for j in range( n )]
+            rowSigs = self.ranks( [(rowSigs[i], rows[i]) for i in range( n )] )
+            colSigs = self.ranks( [(colSigs[j], cols[j]) for j in range( n )] )
+        return rowSigs, colSigs
+
+    # Replaces each signature with its rank among the distinct signatures
+    def ranks ( self, sigs ):
+        order = {sig: rank for rank, sig in enumerate( sorted( set( sigs ) ) )}
+        return [order[sig] for sig in sigs]
+
+    # Orders lines by band signature first, then by line signature in the band
+    def orderLines ( self, sigs, size, bands ):
+        bandOrder = sorted( range( bands ),
+                            key = lambda b: sorted( sigs[b*size:(b+1)*size] ) )
+        order = []
+        for b in bandOrder:
+            order.extend( sorted( range( b*size, (b+1)*size ), key = lambda r: sigs[r] ) )
+        return order
+
+    # Maps a grid into canonical coordinates and digits as a flat list
+    def toCanonical ( self, grid, transform ):
+        transposed, rows, cols, labels = transform
+        g = [list( r ) for r in zip( *grid )] if transposed else grid
+        return [labels[g[r][c]] for r in rows for c in cols]
+
+    # Maps a flat canonical grid back to the coordinates of the original board
+    def fromCanonical ( self, cells, n, transform ):
+        transposed, rows, cols, labels = transform
+        inverse = {v: k for k, v in labels.items()}
+        grid = [[0] * n for i in range( n )]
+        i = 0
+        for r in rows:
+            line = grid[r]
+            for c in cols:
+                line[c] = inverse[cells[i]]
+                i += 1
+        if transposed:
+            grid = [list( r ) for r in zip( *grid )]
+        return grid
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import time
+import queue
+import threading
+import socketserver
+import multiprocessing
+import SudokuBoard
+import SudokuSolver
+import SearchMonitor
+
+"""
+    Long running solver service speaking a JSON-lines protocol on
+    stdin/stdout or on a Unix socket.
+
+    Each request is one JSON object per line:
+
+        {"id": 1, "board": "3 3\n0 0 3 ...", "var": "MinimumRemainingValue",
+         "val": "", "cc": "forwardChecking"}
+
+    where "board" is in the input file format, or "p", "q" and "grid" are
+    given instead. The heuristic fields are optional and use the names
+    BTSolver understands, and an optional "maxBytes" caps the trail's
+    memory (see Trail). Each response is one line:
+
+        {"id": 1, "status": "solved", "solution": [[...]],
+         "stats": {"seconds": ..., "pushes": ..., "backtracks": ...,
+                   "peakTrail": ..., "peakBytes": ..., "latency": ...}}
+
+    with status "solved", "unsolvable", "aborted" (the memory cap was
+    reached) or "error". Requests are collected into batches and run on a
+    pool of worker processes. Each worker keeps a SudokuSolver per
+    heuristic combination, which resets and reuses one network per board
+    shape, and builds the networks of the preloaded shapes when it starts.
+    Responses are written as soon as their batch completes, so they may
+    come back out of order.
+"""
+
+# ==================================================================
+# Worker
+# ==================================================================
+
+# Per worker process: one SudokuSolver per heuristic combination, each
+# keeping a reusable BTSolver per board shape
+SOLVERS = dict()
+
+def solverFor ( val_sh, var_sh, cc ):
+    key = (val_sh, var_sh, cc)
+    solver = SOLVERS.get( key )
+    if solver == None:
+        solver = SudokuSolver.SudokuSolver( var_sh, val_sh, cc )
+        SOLVERS[key] = solver
+    return solver
+
+# Builds the default solver's network for every preloaded shape
+def warmWorker ( shapes, defaults ):
+    solver = solverFor( *defaults )
+    for p, q in shapes:
+        n = p*q
+        solver.solverFor( SudokuBoard.SudokuBoard( p, q, board = [[0] * n for i in range( n )] ) )
+
+def solveRequest ( request, defaults ):
+    try:
+        if "board" in request:
+            board = SudokuBoard.SudokuBoard( text = request["board"] )
+        else:
+            board = SudokuBoard.SudokuBoard( request["p"], request["q"], board = request["grid"] )
+
+        start = time.perf_counter()
+        solver = solverFor( request.get( "val", defaults[0] ),
+                            request.get( "var", defaults[1] ),
+                            request.get( "cc", defaults[2] ) ).solverFor( board )
+
+        trail = solver.trail
+        trail.maxBytes = request.get( "maxBytes" )
+        trail.resetPeak()
+        pushes = trail.getPushCount()
+        backtracks = trail.getUndoCount()
+
+        response = { "id" : request.get( "id" ) }
+        try:
+            solver.solve()
+            if solver.hassolution:
+                response["status"] = "solved"
+                response["solution"] = solver.getSolution().board
+            else:
+                response["status"] = "unsolvable"
+        except SearchMonitor.SearchAborted:
+            trail.clear()
+            response["status"] = "aborted"
+        response["stats"] = {
+            "seconds"    : time.perf_counter() - start,
+            "pushes"     : trail.getPushCount() - pushes,
+            "backtracks" : trail.getUndoCount() - backtracks,
+            "peakTrail"  : trail.getPeakSize(),
+            "peakBytes"  : trail.getPeakBytes(),
+        }
+        return response
+
+    except Exception as e:
+        return { "id" : request.get( "id" ), "status" : "error", "error" : str(e) }
+
+def solveBatch ( requests, defaults ):
+    return [solveRequest( r, defaults ) for r in requests]
+
+# ==================================================================
+# Service
+# ==================================================================
+
+class SolverService:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, processes = None, batchSize = 8, shapes = ((3, 3),),
+                   val_sh = "", var_sh = "MinimumRemainingValue", cc = "forwardChecking" ):
+        self.processes = processes if processes != None else multiprocessing.cpu_count()
+        self.batchSize = batchSize
+        self.shapes = shapes
+        self.defaults = (val_sh, var_sh, cc)
+
+        self.pool = None
+        self.pending = queue.Queue()
+        self.dispatcher = None
+        self.inflight = threading.Semaphore( 4 * self.processes )
+
+    # ==================================================================
+    # Lifecycle
+    # ==================================================================
+
+    def start ( self ):
+        self.pool = multiprocessing.Pool( self.processes, initializer = warmWorker,
+                                         initargs = (self.shapes, self.defaults) )
+        self.dispatcher = threading.Thread( target = self.dispatch, daemon = True )
+        self.dispatcher.start()
+
+    # Waits for every submitted request to be answered, then stops the pool
+    def close ( self ):
+        self.pending.put( None )
+        self.dispatcher.join()
+        self.pool.close()
+        self.pool.join()
+
+    # ==================================================================
+    # Dispatch
+    # ==================================================================
+
+    """
+        Queues one request line; respond is called with the response dict
+        from a pool thread.
+    """
+    def submit ( self, line, respond ):
+        received = time.perf_counter()
+        try:
+            request = json.loads( line )
+        except ValueError as e:
+            respond( { "id" : None, "status" : "error", "error" : "invalid JSON: " + str(e) } )
+            return
+        if not isinstance( request, dict ):
+            respond( { "id" : None, "status" : "error", "error" : "request is not a JSON object" } )
+            return
+        self.pending.put( (request, respond, received) )
+
+    # Groups whatever requests are waiting, up to batchSize, into one pool task
+    def dispatch ( self ):
+        done = False
+        while not done:
+            item = self.pending.get()
+            if item == None:
+                break
+            batch = [item]
+            while len( batch ) < self.batchSize:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item == None:
+                    done = True
+                    break
+                batch.append( item )
+
+            self.inflight.acquire()
+            self.pool.apply_async( solveBatch, ([b[0] for b in batch], self.defaults),
+                                   callback = lambda results, batch = batch: self.deliver( batch, results ),
+                                   error_callback = lambda e, batch = batch: self.fail( batch, e ) )
+
+        # Let every outstanding batch finish before returning
+        for i in range( 4 * self.processes ):
+            self.inflight.acquire()
+
+    # deliver and fail run on the pool's result thread, which must never see
+    # an exception: it would die and leave every later batch unanswered
+    def deliver ( self, batch, results ):
+        now = time.perf_counter()
+        try:
+            for (request, respond, received), response in zip( batch, results ):
+                if "stats" in response:
+                    response["stats"]["latency"] = now - received
+                self.respondSafely( respond, response )
+        finally:
+            self.inflight.release()
+
+    def fail ( self, batch, error ):
+        try:
+            for request, respond, received in batch:
+                id = request.get( "id" ) if isinstance( request, dict ) else None
+                self.respondSafely( respond, { "id" : id, "status" : "error", "error" : str(error) } )
+        finally:
+            self.inflight.release()
+
+    def respondSafely ( self, respond, response ):
+        try:
+            respond( response )
+        except Exception:
+            pass
+
+    # ==================================================================
+    # Transports
+    # ==================================================================
+
+    def serveStdio ( self, inp = None, out = None ):
+        inp = inp if inp != None else sys.stdin
+        out = out if out != None else sys.stdout
+        lock = threading.Lock()
+
+        def respond ( response ):
+            with lock:
+                out.write( json.dumps( response ) + "\n" )
+                out.flush()
+
+        for line in inp:
+            if line.strip():
+                self.submit( line, respond )
+
+    def serveUnix ( self, path ):
+        service = self
+        if os.path.exists( path ):
+            os.unlink( path )
+
+        class Handler ( socketserver.StreamRequestHandler ):
+            def handle ( self ):
+                lock = threading.Lock()
+                wfile = self.wfile
+
+                def respond ( response ):
+                    with lock:
+                        try:
+                            wfile.write( (json.dumps( response ) + "\n").encode() )
+                            wfile.flush()
+                        except OSError:
+                            pass
+
+                for line in self.rfile:
+                    if line.strip():
+                        service.submit( line.decode(), respond )
+
+        server = socketserver.ThreadingUnixStreamServer( path, Handler )
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+def main ( ):
+    args = sys.argv[1:]
+    socketPath = None
+    processes = None
+    batchSize = 8
+    shapes = [(3, 3)]
+
+    for arg in args:
+        if arg.startswith( "--socket=" ):
+            socketPath = arg[len("--socket="):]
+        elif arg.startswith( "--processes=" ):
+            processes = int( arg[len("--processes="):] )
+        elif arg.startswith( "--batch=" ):
+            batchSize = int( arg[len("--batch="):] )
+        elif arg.startswith( "--shapes=" ):
+            shapes = [tuple( int( x ) for x in s.split( "x" ) ) for s in arg[len("--shapes="):].split( "," )]
+        else:
+            print( "Usage: SolverService.py [--socket=path] [--processes=n] [--batch=n] [--shapes=3x3,4x4]" )
+            return
+
+    service = SolverService( processes, batchSize, shapes )
+    service.start()
+    try:
+        if socketPath != None:
+            service.serveUnix( socketPath )
+        else:
+            service.serveStdio()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
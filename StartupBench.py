@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import subprocess
+import tempfile
+import time
+
+"""
+    Startup benchmark for Main.py. Times, over several runs each, a bare
+    interpreter, importing Main, and solving a tiny 4x4 board end to end,
+    and checks the median cost on top of the bare interpreter against a
+    budget in milliseconds. Exits with status 1 when over budget.
+
+        StartupBench.py [budgetMs] [runs]
+"""
+
+TINY_BOARD = "2 2\n1 0 0 4\n0 0 1 0\n0 1 0 0\n4 0 0 1\n"
+
+def median ( values ):
+    values = sorted( values )
+    return values[len( values ) // 2]
+
+def timeCommand ( command, runs, cwd ):
+    times = []
+    for i in range( runs ):
+        start = time.perf_counter()
+        subprocess.run( command, cwd = cwd, stdout = subprocess.DEVNULL, check = True )
+        times.append( time.perf_counter() - start )
+    return median( times ) * 1000
+
+def main ( ):
+    budget = float( sys.argv[1] ) if len( sys.argv ) > 1 else 40.0
+    runs = int( sys.argv[2] ) if len( sys.argv ) > 2 else 15
+    here = os.path.dirname( os.path.abspath( __file__ ) )
+
+    with tempfile.NamedTemporaryFile( "w", suffix = ".txt", delete = False ) as f:
+        f.write( TINY_BOARD )
+        board = f.name
+
+    try:
+        bare = timeCommand( [sys.executable, "-c", "pass"], runs, here )
+        imported = timeCommand( [sys.executable, "-c", "import Main"], runs, here )
+        solved = timeCommand( [sys.executable, "Main.py", "MRV", "FC", board], runs, here )
+    finally:
+        os.remove( board )
+
+    overhead = solved - bare
+    print( "Interpreter: %.1f ms" % bare )
+    print( "Import Main: %.1f ms (+%.1f)" % (imported, imported - bare) )
+    print( "Tiny solve:  %.1f ms (+%.1f)" % (solved, overhead) )
+    print( "Budget:      %.1f ms" % budget )
+
+    if overhead > budget:
+        print( "[FAIL] startup overhead over budget" )
+        sys.exit( 1 )
+    print( "[OK]" )
+
+if __name__ == "__main__":
+    main()
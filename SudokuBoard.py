@@ -1,22 +1,33 @@
-import itertools
-import random
-import Constraint
-import Variable
-
 """
     Represents a Sudoku Board. This is converted to a constraint network,
     so BTSolver can interface with it as a CSP.
+
+    Besides the grid, a board may declare variant constraints, one per line
+    after the grid rows. Cells are written row,col counting from 0.
+
+        diagonal                 both main diagonals hold different values
+        unit r,c r,c ...         the cells hold different values
+        region r,c r,c ...       a jigsaw region; when regions are given
+                                 they replace the p x q blocks and must
+                                 split the grid into N regions of N cells
+        cage total r,c r,c ...   a killer cage: different values adding
+                                 up to total
 """
 
+DECLARATIONS = ( "diagonal", "unit", "region", "cage" )
+
 class SudokuBoard:
 
     # ==================================================================
     # Constructors
     # ==================================================================
 
-    def __init__( self, p = None, q = None, m = None, board = None, filepath = None ):
+    def __init__( self, p = None, q = None, m = None, board = None, filepath = None, text = None, seed = None ):
         self.p = p
         self.q = q
+        self.units = []
+        self.regions = []
+        self.cages = []
         try:
             self.N = self.p*self.q
         except:
@@ -25,28 +36,42 @@ class SudokuBoard:
         if board != None:
             self.board = board
 
-        elif filepath != None:
-            '''read from input file and generate gameboard'''
-            with open(filepath) as f:
-                lines = f.readlines()
+        elif filepath != None or text != None:
+            '''read from input file (or text in the same format) and generate gameboard'''
+            if text != None:
+                lines = text.splitlines()
+            else:
+                with open(filepath) as f:
+                    lines = f.readlines()
+
+            try:
+                self.p = int(float(lines[0].split()[0]))
+                self.q = int(float(lines[0].split()[1]))
+                self.N = self.p*self.q
+            except:
+                self.p = 3
+                self.q = 3
+                self.N = 9
 
-                try:
-                    self.p = int(float(lines[0].split()[0]))
-                    self.q = int(float(lines[0].split()[1]))
-                    self.N = self.p*self.q
-                except:
-                    self.p = 3
-                    self.q = 3
-                    self.N = 9
+            self.board = []
+            for i in range(1, len(lines)):
+                words = lines[i].split()
+                if words and words[0] in DECLARATIONS:
+                    self.declare( words )
+                    continue
 
-                self.board = []
-                for i in range(1, len(lines)):
-                    tempLine = []
-                    for n in lines[i].split():
-                        tempLine.append(self.odometerToInt(n))
-                    self.board.append(tempLine)
+                tempLine = []
+                for n in lines[i].split():
+                    tempLine.append(self.odometerToInt(n))
+                self.board.append(tempLine)
+
+            if self.regions:
+                self.checkRegions()
 
         else:
+            # Random board; the same seed always gives the same board
+            import random
+            rng = random.Random( seed )
             if m == None:
                 m = 7
             if p == None:
@@ -60,9 +85,9 @@ class SudokuBoard:
                 if m <= 0:
                     break
 
-                randomRow = random.randint(0, self.N-1)
-                randomCol = random.randint(0, self.N-1)
-                randomAssignment = random.randint(1, self.N)
+                randomRow = rng.randint(0, self.N-1)
+                randomCol = rng.randint(0, self.N-1)
+                randomAssignment = rng.randint(1, self.N)
                 if self.board[randomRow][randomCol] == 0 and self.isValidValue( randomRow, randomCol, randomAssignment ):
                     self.board[randomRow][randomCol] = randomAssignment
                     m -= 1
@@ -91,6 +116,72 @@ class SudokuBoard:
                 output += "\n"
         return output
 
+    # Returns the board in the file format read by the filepath constructor
+    def toFileString ( self ):
+        output = str(self.p) + " " + str(self.q) + "\n"
+        for row in self.board:
+            output += " ".join( self.intToOdometer( v ) for v in row ) + "\n"
+        for unit in self.units:
+            output += "unit " + self.cellsString( unit ) + "\n"
+        for region in self.regions:
+            output += "region " + self.cellsString( region ) + "\n"
+        for total, cells in self.cages:
+            output += "cage " + str(total) + " " + self.cellsString( cells ) + "\n"
+        return output
+
+    # ==================================================================
+    # Variant Constraints
+    # ==================================================================
+
+    # True if the board declares any constraint beyond rows, cols and blocks
+    def isVariant ( self ):
+        return bool( self.units or self.regions or self.cages )
+
+    # Adds the constraint declared by one line of the input, split in words
+    def declare ( self, words ):
+        if words[0] == "diagonal":
+            self.units.append( [(i, i) for i in range(self.N)] )
+            self.units.append( [(i, self.N-1-i) for i in range(self.N)] )
+        elif words[0] == "unit":
+            self.units.append( self.parseCells( words[1:] ) )
+        elif words[0] == "region":
+            self.regions.append( self.parseCells( words[1:] ) )
+        elif words[0] == "cage":
+            if len( words ) < 3 or not words[1].isdigit():
+                raise ValueError( "a cage needs a total and at least one cell" )
+            cells = self.parseCells( words[2:] )
+            if len( set( cells ) ) != len( cells ):
+                raise ValueError( "cage " + self.cellsString( cells ) + " repeats a cell" )
+            self.cages.append( (int( words[1] ), cells) )
+
+    def parseCells ( self, words ):
+        cells = []
+        for w in words:
+            row, col = w.split( "," )
+            row, col = int( row ), int( col )
+            if not (0 <= row < self.N and 0 <= col < self.N):
+                raise ValueError( "cell " + w + " is outside the " + str(self.N) + "x" + str(self.N) + " grid" )
+            cells.append( (row, col) )
+        return cells
+
+    # Raises ValueError unless the regions split the grid into N regions of N cells
+    def checkRegions ( self ):
+        if len( self.regions ) != self.N:
+            raise ValueError( "expected " + str(self.N) + " regions, got " + str(len( self.regions )) )
+
+        seen = set()
+        for region in self.regions:
+            if len( region ) != self.N:
+                raise ValueError( "region " + self.cellsString( region ) + " has " + str(len( region ))
+                                  + " cells, expected " + str(self.N) )
+            for cell in region:
+                if cell in seen:
+                    raise ValueError( "cell " + self.cellsString( [cell] ) + " is in more than one region" )
+                seen.add( cell )
+
+    def cellsString ( self, cells ):
+        return " ".join( str(row) + "," + str(col) for row, col in cells )
+
     # ==================================================================
     # Private Helper Methods
     # ==================================================================
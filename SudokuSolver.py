@@ -0,0 +1,95 @@
+import BTSolver
+import Trail
+
+"""
+    Library entry point: a configured solver that is built once and reused
+    across many boards.
+
+        solver = SudokuSolver( "MinimumRemainingValue", "LeastConstrainingValue", "forwardChecking" )
+        solution = solver.solve( board )
+        for solution in solver.solveMany( boards ):
+            ...
+
+    Heuristic names are those BTSolver understands and are checked here.
+    Each p x q shape gets one BTSolver whose network, neighbor lists, trail
+    and resolved heuristics are reset and reused for every board of that
+    shape, instead of rebuilding them per board.
+"""
+
+VAR_HEURISTICS = ( "", "MinimumRemainingValue", "Degree", "MRVwithTieBreaker", "DomWeightedDegree", "tournVar" )
+VAL_HEURISTICS = ( "", "LeastConstrainingValue", "tournVal" )
+CONSISTENCY_CHECKS = ( "", "forwardChecking", "norvigCheck", "tournCC" )
+
+class SudokuSolver:
+
+    # ==================================================================
+    # Constructors
+    # ==================================================================
+
+    def __init__ ( self, var_sh = "", val_sh = "", cc = "", learn = False ):
+        if var_sh not in VAR_HEURISTICS:
+            raise ValueError( "unknown variable heuristic: " + str(var_sh) )
+        if val_sh not in VAL_HEURISTICS:
+            raise ValueError( "unknown value heuristic: " + str(val_sh) )
+        if cc not in CONSISTENCY_CHECKS:
+            raise ValueError( "unknown consistency check: " + str(cc) )
+
+        self.varHeuristics = var_sh
+        self.valHeuristics = val_sh
+        self.cChecks = cc
+        self.learn = learn
+
+        self.solvers = dict()
+        self.lastPushes = 0
+        self.lastBacktracks = 0
+
+    # ==================================================================
+    # Accessors
+    # ==================================================================
+
+    # Trail pushes and backtracks of the last solve
+    def getLastPushCount ( self ):
+        return self.lastPushes
+
+    def getLastBacktrackCount ( self ):
+        return self.lastBacktracks
+
+    # ==================================================================
+    # Solving
+    # ==================================================================
+
+    # Returns the solution of board as a SudokuBoard, or None
+    def solve ( self, board ):
+        solver = self.solverFor( board )
+        trail = solver.trail
+        pushes = trail.getPushCount()
+        backtracks = trail.getUndoCount()
+
+        solver.solve()
+
+        self.lastPushes = trail.getPushCount() - pushes
+        self.lastBacktracks = trail.getUndoCount() - backtracks
+        return solver.getSolution() if solver.hassolution else None
+
+    # Yields the solution (or None) of every board, in order
+    def solveMany ( self, boards ):
+        for board in boards:
+            yield self.solve( board )
+
+    def solverFor ( self, board ):
+        # A network only fits boards with the same constraints, so boards
+        # declaring variant constraints get a solver of their own
+        key = (board.p, board.q)
+        solver = self.solvers.get( key ) if not board.isVariant() else None
+        if solver == None:
+            nogoods = None
+            if self.learn:
+                import NogoodStore
+                nogoods = NogoodStore.NogoodStore()
+            solver = BTSolver.BTSolver( board, Trail.Trail(), self.valHeuristics, self.varHeuristics,
+                                        self.cChecks, nogoods )
+            if not board.isVariant():
+                self.solvers[key] = solver
+        else:
+            solver.reset( board )
+        return solver
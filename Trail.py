@@ -1,12 +1,28 @@
-# import copy
-import Variable
+import sys
 import Domain
-import copy
+import SearchMonitor
 
 """
     Represents the trail of changes made. This allows backtracking to occur.
+
+    The trail also keeps an approximate count of the bytes its entries hold
+    and the largest size and byte count it reached. When given a memory
+    ceiling it compacts itself the first time the ceiling is crossed, and
+    aborts the search with SearchAborted("memory") if the compact trail
+    crosses it too.
 """
 
+# Approximate bytes of a [variable, Domain] entry apart from the values:
+# the pair, the Domain, its attribute dict and its empty value list
+ENTRY_BYTES = ( sys.getsizeof( [None, None] ) + sys.getsizeof( Domain.Domain( [] ) )
+              + sys.getsizeof( vars( Domain.Domain( [] ) ) ) + sys.getsizeof( [] ) )
+
+# Approximate bytes of a compact (variable, tuple of values) entry apart from the values
+COMPACT_ENTRY_BYTES = sys.getsizeof( (None, None) ) + sys.getsizeof( () )
+
+# Bytes per value held in an entry's list or tuple
+VALUE_BYTES = sys.getsizeof( (None,) ) - sys.getsizeof( () )
+
 class Trail:
 
     # ==================================================================
@@ -19,10 +35,17 @@ class Trail:
     # Constructor
     # ==================================================================
 
-    def __init__ ( self ):
+    def __init__ ( self, maxBytes = None ):
         self.trailStack  = []
         self.trailMarker = []
 
+        # Memory accounting, see getBytes
+        self.maxBytes  = maxBytes
+        self.compact   = False
+        self.bytes     = 0
+        self.peakSize  = 0
+        self.peakBytes = 0
+
     # ==================================================================
     # Accessors
     # ==================================================================
@@ -36,6 +59,21 @@ class Trail:
     def getUndoCount ( self ):
         return Trail.numUndo
 
+    # Approximate bytes held by the entries on the trail
+    def getBytes ( self ):
+        return self.bytes
+
+    # Largest number of entries on the trail since the last resetPeak
+    def getPeakSize ( self ):
+        return self.peakSize
+
+    # Largest approximate byte count of the trail since the last resetPeak
+    def getPeakBytes ( self ):
+        return self.peakBytes
+
+    def isCompact ( self ):
+        return self.compact
+
     # ==================================================================
     # Modifiers
     # ==================================================================
@@ -52,9 +90,22 @@ class Trail:
     """
     def push ( self, v ):
         Trail.numPush += 1
-        domainCopy = Domain.Domain( [i for i in v.getValues()] )
-        vPair = [v, domainCopy]
-        self.trailStack.append(vPair)
+        values = v.getValues()
+        if self.compact:
+            self.trailStack.append( (v, tuple( values )) )
+            self.bytes += COMPACT_ENTRY_BYTES + VALUE_BYTES * len( values )
+        else:
+            domainCopy = Domain.Domain( [i for i in values] )
+            vPair = [v, domainCopy]
+            self.trailStack.append(vPair)
+            self.bytes += ENTRY_BYTES + VALUE_BYTES * len( values )
+
+        if self.bytes > self.peakBytes:
+            self.peakBytes = self.bytes
+        if len( self.trailStack ) > self.peakSize:
+            self.peakSize = len( self.trailStack )
+        if self.maxBytes != None and self.bytes > self.maxBytes:
+            self.overflow()
 
     # Pops and restores variables on the trail until the last trail marker
     def undo ( self ):
@@ -64,11 +115,43 @@ class Trail:
         while size > targetSize:
             vPair = self.trailStack.pop()
             v = vPair[0]
-            v.setDomain( vPair[1] )
+            if type( vPair ) is tuple:
+                self.bytes -= COMPACT_ENTRY_BYTES + VALUE_BYTES * len( vPair[1] )
+                v.setDomain( Domain.Domain( list( vPair[1] ) ) )
+            else:
+                self.bytes -= ENTRY_BYTES + VALUE_BYTES * vPair[1].size()
+                v.setDomain( vPair[1] )
             v.setModified( False )
             size -= 1
 
+    """
+        Called when the trail outgrows maxBytes. The first time, every
+        entry is rewritten as a (variable, tuple of values) pair, which
+        holds the same domain in a fraction of the memory, and later pushes
+        use that form too. If the compact trail still outgrows maxBytes the
+        search is aborted.
+    """
+    def overflow ( self ):
+        if not self.compact:
+            self.compact = True
+            self.bytes = 0
+            for i in range( len( self.trailStack ) ):
+                v, domain = self.trailStack[i]
+                self.trailStack[i] = (v, tuple( domain.values ))
+                self.bytes += COMPACT_ENTRY_BYTES + VALUE_BYTES * len( domain.values )
+            if self.bytes <= self.maxBytes:
+                return
+
+        raise SearchMonitor.SearchAborted( "memory" )
+
+    # Starts a new peak measurement from the current trail
+    def resetPeak ( self ):
+        self.peakSize = len( self.trailStack )
+        self.peakBytes = self.bytes
+
     # Clears the trail
     def clear ( self ):
         self.trailStack = []
         self.trailMarker = []
+        self.compact = False
+        self.bytes = 0
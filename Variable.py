@@ -1,4 +1,3 @@
-import Trail
 import Domain
 
 """
@@ -29,6 +28,16 @@ class Variable:
             self.modified = False
             self.changeable = True
 
+    # Gives the variable a new initial domain, as the constructor would
+    def reset ( self, possible_Values ):
+        self.domain = Domain.Domain( possible_Values )
+        if self.size() == 1:
+            self.modified = True
+            self.changeable = False
+        else:
+            self.modified = False
+            self.changeable = True
+
     def copy ( self, v ):
         self.domain = v.domain
         self.row = v.row